@@ -1,19 +1,31 @@
 -- Drop all procedures
 DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.COUNT_PDF_PAGES_PROC();
-DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.HANDLE_PDF_FILES();
+DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.HANDLE_PDF_FILES(NUMBER);
+DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.EXTRACT_CONTROLLER();
 DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MANAGE_MANUAL_REVIEW_FILES();
+DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MOVE_STAGE_FILES(VARCHAR, VARCHAR, ARRAY);
 DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.LOAD_MODEL_FLATTEN();
 DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.LOAD_MODEL_VALIDATED();
 DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MOVEFILES_TO_SOURCE(VARCHAR);
 DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.IGNOREFILES_TO_STAGE(VARCHAR);
+DROP PROCEDURE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MOVE_REVIEW_FILES(VARCHAR, ARRAY);
+DROP FUNCTION IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.SCORE_FAILURES(VARIANT, OBJECT);
 
 -- Drop all tasks
 DROP TASK IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.EXTRACT_DATA;
+DROP TASK IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.EXTRACT_LEASE_RECOVERY;
 DROP TASK IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.FLATTEN_DATA;
 DROP TASK IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.VALIDATE_DATA;
 DROP TASK IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PREPROCESSING;
 DROP TASK IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MANUAL_CHECKUP_FILES;
 
+-- Drop the change streams of every stage
+DROP STREAM IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PREPROCESS_STREAM;
+DROP STREAM IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PREFILTER_STREAM;
+DROP STREAM IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.EXTRACTION_STREAM;
+DROP STREAM IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.INVOICE_FLATTEN_STREAM;
+DROP STREAM IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PURCHASE_FLATTEN_STREAM;
+
 -- Drop any additional objects referenced in the script
 -- Note: Ensure these objects exist before attempting to drop them
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MODEL_METADATA;
@@ -23,12 +35,23 @@ DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PURCHASE_COL_SCORE_FAILED_HISTORY;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.MANUAL_REVIEW_HISTORY_LOG;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_PREFILTER;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_ORDERFORM_EXTRACTION;
+DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.STREAMDATA_TEMP;
+DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_EXTRACT_QUEUE;
+DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_FLATTEN_QUEUE;
+DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_EXTRACTION_CACHE;
+DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_EXTRACTION_CACHE_STATS;
+DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.DOCAI_PIPELINE_RUN_LOG;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.Invoice_Flatten;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.Purchase_Flatten;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.Invoice_Validated;
 DROP TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.Purchase_Validated;
+DROP DYNAMIC TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PIPELINE_STATUS_SUMMARY;
+DROP DYNAMIC TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PIPELINE_DAILY_ROLLUP;
+DROP DYNAMIC TABLE IF EXISTS DS_DEV_DB.DOC_AI_SCHEMA.PIPELINE_HOURLY_ROLLUP;
 
 -- Additional cleanup for stages if needed
 REMOVE @MANUAL_REVIEW;
 REMOVE @INVOICE_DOCS;
-REMOVE @IGNOIRED_DOCS;
\ No newline at end of file
+REMOVE @IGNOIRED_DOCS;
+REMOVE @DOCAI_SPLIT_WORK;
+REMOVE @DOCAI_CODE;
\ No newline at end of file
@@ -4,15 +4,11 @@ import pandas as pd
 import altair as alt
 import pypdfium2 as pdfium
 import os
-import time
+import json
 import plotly.graph_objects as go
-from time import sleep
 import plotly.express as px
 from datetime import datetime, timedelta
 
-import plotly.express as px
-from datetime import datetime
-
 # Set up the Snowflake session
 session = get_active_session()
 
@@ -23,70 +19,63 @@ meta_table = "MODEL_METADATA"
 manual_history_log = "manual_review_history_log"
 doc_stage = "INVOICE_DOCS"
 manula_stage_name = 'MANUAL_REVIEW'  
+ignored_stage = "IGNOIRED_DOCS"
 
-# Dynamically define the tables for each model
+# Tables shared by every model; per-model tables come from the model registry
 tables = {
     "prefilter": "DOCAI_PREFILTER",
     "extraction": "DOCAI_ORDERFORM_EXTRACTION",
     "threshold": "SCORE_THRESHOLD",
+    "summary": "PIPELINE_STATUS_SUMMARY",
+    "hourly_rollup": "PIPELINE_HOURLY_ROLLUP",
+    "daily_rollup": "PIPELINE_DAILY_ROLLUP",
 }
 
-def fetch_model_names_from_metadata(db_name, schema_name, meta_table):
-    try:
-        # Query to fetch model names from the metadata table
-        query = f"SELECT MODEL_NAME FROM {db_name}.{schema_name}.{meta_table}"
-        
-        # Execute the query and convert the result to a pandas dataframe
-        model_df = session.sql(query).to_pandas()
-
-        # Check if the dataframe is empty
-        if model_df.empty:
-            st.warning("No models found in the MODEL_METADATA table.")
-            return []
+# How long a loaded MODEL_METADATA stays fresh for edits made outside the app
+METADATA_TTL_SECONDS = 600
 
-        # Return a list of model names
-        return model_df["MODEL_NAME"].tolist()
-
-    except Exception as e:
-        st.error(f"Error fetching model names from metadata: {str(e)}")
-        return []
+# How long one pipeline status snapshot is shared by every open dashboard
+PIPELINE_STATUS_TTL_SECONDS = 30
 
+# Live View auto refresh choices, in seconds; None turns it off
+LIVE_VIEW_REFRESH_OPTIONS = {
+    "Off": None,
+    "30 seconds": 30,
+    "1 minute": 60,
+    "5 minutes": 300,
+}
 
-# List of model names
-model_names_list = model_names_list = fetch_model_names_from_metadata(db_name, schema_name, meta_table)
+# Dashboard time ranges; Custom picks the days. Ranges up to a week read the
+# hourly rollup, longer ones the daily rollup.
+DASHBOARD_RANGES = {
+    "Last 24 hours": timedelta(hours=24),
+    "Last 7 days": timedelta(days=7),
+    "Last 30 days": timedelta(days=30),
+    "Last 90 days": timedelta(days=90),
+    "Custom": None,
+}
+HOURLY_ROLLUP_MAX_RANGE = timedelta(days=7)
 
 
-def get_model_table_names(db_name, schema_name, meta_table):
-    # Query to fetch table names for all models
-    query = f"""
-        SELECT *
-        FROM {db_name}.{schema_name}.{meta_table}
+@st.cache_resource
+def metadata_version():
     """
-    
-    # Execute the query and convert it to a pandas dataframe
-    try:
-        model_df = session.sql(query).to_pandas()
-        if model_df.empty:
-            st.warning("No models found in the metadata table.")
-            return {}
-        return model_df
-    except Exception as e:
-        st.error(f"Error fetching model table names: {str(e)}")
-        return {}
-
-
-# Fetch model table data dynamically
-model_table_names = get_model_table_names(db_name, schema_name, meta_table)
+    Counter shared by every session of the app. Saving the Settings page
+    bumps it, so all sessions reload MODEL_METADATA on their next rerun.
+    """
+    return {"version": 0}
 
 
-# Add dynamic entries for each model from the fetched metadata
-for _, row in model_table_names.iterrows():
-    model_name = row["MODEL_NAME"]
-    tables[model_name] = {
-        "flattened": row["FLATTEN_TABLE"], 
-        "validated": row["VALIDATED_TABLE"], 
-        "score_failed": row["FAILED_SCORE_TABLE"]
-    }
+@st.cache_data(ttl=METADATA_TTL_SECONDS, show_spinner=False)
+def load_model_registry(version):
+    """
+    Read MODEL_METADATA in one query and return its rows keyed by
+    MODEL_NAME. Cached across sessions per VERSION; every caller gets its
+    own copy, so the cached registry cannot be changed in place. Errors
+    are raised, and therefore not cached.
+    """
+    rows = get_active_session().sql(f"SELECT * FROM {db_name}.{schema_name}.{meta_table}").collect()
+    return {row["MODEL_NAME"]: row.as_dict() for row in rows}
 
 
 # Create a temporary directory for PDFs if it doesn't exist
@@ -96,9 +85,18 @@ os.makedirs(TEMP_DIR, exist_ok=True)
 # App title and layout
 st.set_page_config(page_title="DocAI Dashboard", layout="wide")
 
+# Model registry: MODEL_METADATA rows keyed by MODEL_NAME
+try:
+    model_registry = load_model_registry(metadata_version()["version"])
+    if not model_registry:
+        st.warning("No models found in the MODEL_METADATA table.")
+except Exception as e:
+    st.error(f"Error fetching model metadata: {str(e)}")
+    model_registry = {}
+
 def dashboard_section():
-    # Check if form_selection is in the model_names_list
-    if form_selection in model_names_list:
+    # Check if form_selection is in the model registry
+    if form_selection in model_registry:
         st.title(f"📊 {form_selection} Dashboard")
         st.header(f"{form_selection} Processing Status")
     else:
@@ -123,14 +121,8 @@ def metadata_table_selection():
     st.write("MetaData and settings.")
     
 def welcome_page():
-    # Fetch model details (this is where you get the model names)
-    model_details = fetch_model_details()
-
-    # Get a list of model names
-    model_names = model_details["MODEL_NAME"].tolist()
-
-    # Convert the list to a comma-separated string to display in the message
-    model_names_str = ", ".join(model_names)
+    # Convert the model names to a comma-separated string to display in the message
+    model_names_str = ", ".join(model_registry)
 
     # Display the welcome page with the dynamic model names
     st.title("🎉 Welcome to the DocAI System")
@@ -142,30 +134,13 @@ def welcome_page():
 
 
 
-# Fetch model names and additional details dynamically from MODEL_METADATA
-def fetch_model_details():
-    try:
-        query = f"SELECT MODEL_NAME, FOLDER_NAME FROM {db_name}.{schema_name}.{meta_table}"
-        model_df = session.sql(query).to_pandas()
-        if not model_df.empty:
-            return model_df
-        else:
-            st.warning("No models found in MODEL_METADATA.")
-            return pd.DataFrame(columns=["MODEL_NAME", "FOLDER_NAME"])
-    except Exception as e:
-        st.error(f"Error fetching model details: {str(e)}")
-        return pd.DataFrame(columns=["MODEL_NAME", "FOLDER_NAME"])
-
+def get_table_names_for_model(model_name):
+    # Find the model in the registry
+    model = model_registry.get(model_name)
 
-def get_table_names_for_model(model_name, model_table_names):
-    # Find the model in the metadata dataframe
-    model_row = model_table_names[model_table_names["MODEL_NAME"] == model_name]
-    
-    if not model_row.empty:
-        # Extract the table names from the row for the selected model
-        flattened_table = model_row.iloc[0]["FLATTEN_TABLE"]
-        validated_table = model_row.iloc[0]["VALIDATED_TABLE"]
-        return flattened_table, validated_table
+    if model:
+        # Extract the table names for the selected model
+        return model["FLATTEN_TABLE"], model["VALIDATED_TABLE"]
     else:
         st.error(f"Model '{model_name}' not found in metadata.")
         return None, None
@@ -178,16 +153,10 @@ def fetch_table_data(query):
 # Sidebar setup
 st.sidebar.title("DocAI Navigation")
 
-# Fetch model details
-model_details = fetch_model_details()
-
-# Get a list of model names for the dropdown
-model_names = model_details["MODEL_NAME"].tolist()
-
 # Sidebar dropdown for model selection
 form_selection = st.sidebar.selectbox(
     "Select Doc AI Model",
-    ["Select Forms"] + model_names,  # Prepend default option
+    ["Select Forms"] + list(model_registry),  # Prepend default option
     index=0
 )
 
@@ -199,7 +168,7 @@ if 'selected_tab' not in st.session_state:
     st.session_state['selected_tab'] = "Manual Review"  # Default to 'Manual Review'
 
 # Sidebar options based on selected form
-if form_selection in model_names_list:
+if form_selection in model_registry:
     # Dynamic title for sidebar navigation
     st.sidebar.markdown(f"### 🚚 {form_selection} Navigation")
 
@@ -246,46 +215,86 @@ def list_stage_files(stage_name):
 
 def get_table_name(table_key, category=None):
     if category:
-        # Return table name for nested categories like "order" or "delivery"
-        return f"{db_name}.{schema_name}.{tables[category][table_key]}"
+        # Return a model's table, e.g. get_table_name("FLATTEN_TABLE", "INVOICE_MODEL")
+        return f"{db_name}.{schema_name}.{model_registry[category][table_key]}"
     else:
         # Return table name for top-level keys
         return f"{db_name}.{schema_name}.{tables[table_key]}"
 
-def get_score_failed_table(model_name, model_table_names):
-    # Find the model in the metadata dataframe
-    model_row = model_table_names[model_table_names["MODEL_NAME"] == model_name]
-    if not model_row.empty:
-        return model_row.iloc[0]["FAILED_SCORE_TABLE"]
-    else:
-        st.error(f"Model '{model_name}' not found in metadata.")
-        return None
-
-# Define a function to fetch table and query dynamically based on the selected model
-def get_table_and_query(model_name):
-    if model_name in model_names_list:
-        # Dynamically select the prefilter table and the score failed table
-        prefilter_table = tables['prefilter']
-        score_failed_table = get_score_failed_table(model_name, model_table_names)
-
-        fetch_failed_query = f"""
-            SELECT SCORE_NAME, COUNT(*) AS FAILURE_COUNT, MAX(SCORE_VALUE) AS SCORE_VALUE
-            FROM {score_failed_table}
-            GROUP BY SCORE_NAME
-            ORDER BY FAILURE_COUNT DESC;
-        """
-        return prefilter_table, fetch_failed_query
+# Failure counts per score name of a model, from the pipeline summary
+def fetch_score_failures(model_name):
+    failures = [
+        {"SCORE_NAME": row["SCORE_NAME"], "FAILURE_COUNT": row["RECORDS"], "SCORE_VALUE": row["MAX_SCORE_VALUE"]}
+        for row in fetch_pipeline_summary(model_name) if row["STAGE"] == "SCORE_FAILED"
+    ]
+    return pd.DataFrame(failures, columns=["SCORE_NAME", "FAILURE_COUNT", "SCORE_VALUE"]).sort_values(
+        "FAILURE_COUNT", ascending=False
+    )
+
+
+@st.cache_data(ttl=PIPELINE_STATUS_TTL_SECONDS, show_spinner=False)
+def fetch_rollup(model_name, rollup, range_start, range_end):
+    """
+    Documents and pages per BUCKET_START and STATUS of one model from the
+    hourly or daily ROLLUP, for the UTC buckets starting in
+    [RANGE_START, RANGE_END). Cached across sessions.
+    """
+    return get_active_session().sql(
+        f"""
+        SELECT BUCKET_START, STATUS, DOCUMENTS, PAGES
+        FROM {tables[rollup]}
+        WHERE MODEL_NAME = ? AND BUCKET_START >= ? AND BUCKET_START < ?
+        ORDER BY BUCKET_START
+        """,
+        params=[model_name, range_start.strftime('%Y-%m-%d %H:%M:%S'), range_end.strftime('%Y-%m-%d %H:%M:%S')],
+    ).to_pandas()
+
+
+def dashboard_time_range():
+    """
+    Time range picker of the dashboard. Returns the range label, its UTC
+    start and end on bucket boundaries and the rollup to read, or None
+    while a custom range is incomplete.
+    """
+    range_label = st.selectbox(
+        "Time range",
+        list(DASHBOARD_RANGES),
+        index=list(DASHBOARD_RANGES).index("Last 30 days"),
+        key="dashboard_range",
+    )
+    now = datetime.utcnow()
+    if DASHBOARD_RANGES[range_label] is None:
+        today = now.date()
+        picked = st.date_input(
+            "Custom range (UTC)", value=(today - timedelta(days=30), today), max_value=today, key="dashboard_custom_range"
+        )
+        if len(picked) != 2:
+            st.info("Select the last day of the range.")
+            return None
+        range_start = datetime.combine(picked[0], datetime.min.time())
+        range_end = datetime.combine(picked[1], datetime.min.time()) + timedelta(days=1)
+        range_label = f"{picked[0]:%Y-%m-%d} to {picked[1]:%Y-%m-%d}"
     else:
-        st.error(f"Invalid form selection: {model_name}")
-        return None, None
+        # End on the next hour, so the range and its cached rollup rows stay the same within the hour
+        range_end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        range_start = range_end - DASHBOARD_RANGES[range_label]
+
+    if range_end - range_start <= HOURLY_ROLLUP_MAX_RANGE:
+        return range_label, range_start, range_end, "hourly_rollup"
+    return range_label, range_start.replace(hour=0), range_end, "daily_rollup"
 
 
 def dashboard_section():
-    # Get current time and calculate the range for the last 30 days
-    now = datetime.now()
-    last_30_days = now - timedelta(days=30)
+    if form_selection not in model_registry:
+        st.error(f"Invalid form selection: {form_selection}")
+        return
+
+    time_range = dashboard_time_range()
+    if time_range is None:
+        return
+    range_label, range_start, range_end, rollup = time_range
 
-    # Display the static time range as a grey box
+    # Display the selected time range as a grey box
     st.markdown(
         f"""
         <div style="
@@ -299,35 +308,25 @@ def dashboard_section():
             position: relative; 
             margin : 30px auto 20px auto ;
             box-shadow: 1px 1px 3px #ddd;">
-            <strong>Time Range:</strong> {last_30_days.strftime('%Y-%m-%d %H:%M:%S')} - {now.strftime('%Y-%m-%d %H:%M:%S')}
+            <strong>Time Range (UTC):</strong> {range_start.strftime('%Y-%m-%d %H:%M:%S')} - {range_end.strftime('%Y-%m-%d %H:%M:%S')}
         </div>
         """,
         unsafe_allow_html=True
     )
 
-    # Fetch the prefilter table and failed records query dynamically based on form_selection
-    prefilter_table, fetch_failed_query = get_table_and_query(form_selection)
-
-    if not prefilter_table or not fetch_failed_query:
-        return  # Exit if invalid form selection or no data to process
-
-    # Query for the last 30 days
-    query_status = f"""
-    SELECT STATUS, COUNT(*) AS COUNT
-    FROM {prefilter_table}
-    WHERE DATECREATED >= '{last_30_days.strftime('%Y-%m-%d %H:%M:%S')}'
-          AND DATECREATED <= '{now.strftime('%Y-%m-%d %H:%M:%S')}'
-    GROUP BY STATUS
-    """
-
-    # Fetch data for the last 30 days
-    status_df = fetch_table_data(query_status)
+    # Documents per time bucket and status for the selected range
+    try:
+        rollup_df = fetch_rollup(form_selection, rollup, range_start, range_end)
+    except Exception as e:
+        st.error(f"Error fetching processing status: {str(e)}")
+        rollup_df = pd.DataFrame(columns=["BUCKET_START", "STATUS", "DOCUMENTS", "PAGES"])
 
-    if not status_df.empty:
+    if not rollup_df.empty:
         # Standardize and clean the 'STATUS' column
-        status_df["STATUS"] = status_df["STATUS"].str.title()
-        status_df["STATUS"] = status_df["STATUS"].replace({"Failed": "Manual Review"})
-        status_df["STATUS"] = status_df["STATUS"].replace({"Manual_Review": "Manual Review"})
+        rollup_df["STATUS"] = rollup_df["STATUS"].str.title()
+        rollup_df["STATUS"] = rollup_df["STATUS"].replace({"Failed": "Manual Review"})
+        rollup_df["STATUS"] = rollup_df["STATUS"].replace({"Manual_Review": "Manual Review"})
+        status_df = rollup_df.groupby("STATUS", as_index=False)["DOCUMENTS"].sum().rename(columns={"DOCUMENTS": "COUNT"})
 
         # Define color mapping for statuses
         color_mapping = {
@@ -354,17 +353,58 @@ def dashboard_section():
             ),
             tooltip=["STATUS", "COUNT"]
         ).properties(
-            title="Status Distribution (Last 30 Days)"
+            title=f"Status Distribution ({range_label})"
         )
 
-        # Display the chart
-        st.altair_chart(pie_chart, use_container_width=True)
+        # Documents and pages per bucket, stacked by status
+        bucket = "hour" if rollup == "hourly_rollup" else "day"
+        throughput_base = alt.Chart(rollup_df).encode(
+            x=alt.X("BUCKET_START:T", title=f"{bucket.title()} (UTC)")
+        )
+        documents_chart = throughput_base.mark_bar().encode(
+            y=alt.Y("sum(DOCUMENTS):Q", title="Documents"),
+            color=alt.Color(
+                "STATUS:N",
+                scale=alt.Scale(
+                    domain=list(color_mapping.keys()),
+                    range=list(color_mapping.values())
+                )
+            ),
+            tooltip=[
+                alt.Tooltip("BUCKET_START:T", title=bucket.title()),
+                alt.Tooltip("STATUS:N", title="Status"),
+                alt.Tooltip("sum(DOCUMENTS):Q", title="Documents"),
+            ]
+        ).properties(
+            title=f"Documents per {bucket.title()}"
+        )
+        pages_chart = throughput_base.mark_line(point=True, color="steelblue").encode(
+            y=alt.Y("sum(PAGES):Q", title="Pages"),
+            tooltip=[
+                alt.Tooltip("BUCKET_START:T", title=bucket.title()),
+                alt.Tooltip("sum(PAGES):Q", title="Pages"),
+            ]
+        ).properties(
+            title=f"Pages per {bucket.title()}"
+        )
+
+        # Display the charts side by side
+        pie_column, throughput_column = st.columns([1, 2])
+        with pie_column:
+            st.altair_chart(pie_chart, use_container_width=True)
+        with throughput_column:
+            st.altair_chart(documents_chart, use_container_width=True)
+            st.altair_chart(pages_chart, use_container_width=True)
     else:
         st.info("No data available for the selected time range.")
 
     # Fetch failed records and display bar chart
     st.subheader("Failed Records Analysis")
-    failed_df = fetch_table_data(fetch_failed_query)
+    try:
+        failed_df = fetch_score_failures(form_selection)
+    except Exception as e:
+        st.error(f"Error fetching failed records: {str(e)}")
+        return
 
     if not failed_df.empty:
         failed_df["SCORE_NAME"] = failed_df["SCORE_NAME"].astype(str)
@@ -484,22 +524,40 @@ def previous_pdf_page():
         st.session_state["pdf_page"] -= 1
 
 
-def fetch_table_data1(query):
-    try:
-        # Get the active Snowflake session
-        session = get_active_session()
-
-        # Execute the query
-        result = session.sql(query).collect()
+@st.cache_data(ttl=PIPELINE_STATUS_TTL_SECONDS, show_spinner=False)
+def fetch_pipeline_summary(model_name):
+    """
+    PIPELINE_STATUS_SUMMARY rows of one model as dicts: counts and
+    processing seconds per STAGE and STATUS, and SCORE_FAILED rows per
+    SCORE_NAME. Cached across sessions, so extra viewers do not add queries.
+    """
+    rows = get_active_session().sql(
+        f"SELECT * FROM {tables['summary']} WHERE MODEL_NAME = ?", params=[model_name]
+    ).collect()
+    return [row.as_dict() for row in rows]
 
-        # Extract the count from the query result
-        if result and len(result) > 0:
-            return result[0][0]  # Assuming the count is in the first row, first column
-        return 0  # Return 0 if no result is found
 
-    except Exception as e:
-        print(f"Error executing query: {str(e)}")
-        return 0  # Return 0 in case of error
+def fetch_pipeline_status(model_name):
+    """
+    Stage totals of one model from its summary rows. Returns {stage: row}
+    for PREFILTER, EXTRACTION, FLATTEN and VALIDATED, each with RECORDS,
+    NOT_PROCESSED, PROCESSED, FAILED and TOTAL_SECONDS over the
+    TIMED_RECORDS that have both process times.
+    """
+    status = {
+        stage: dict.fromkeys(["RECORDS", "NOT_PROCESSED", "PROCESSED", "FAILED", "TOTAL_SECONDS", "TIMED_RECORDS"], 0)
+        for stage in ["PREFILTER", "EXTRACTION", "FLATTEN", "VALIDATED"]
+    }
+    for row in fetch_pipeline_summary(model_name):
+        totals = status.get(row["STAGE"])
+        if totals is None:
+            continue
+        totals["RECORDS"] += row["RECORDS"]
+        totals["TOTAL_SECONDS"] += row["TOTAL_SECONDS"] or 0
+        totals["TIMED_RECORDS"] += row["TIMED_RECORDS"]
+        if row["STATUS"] in ("NOT PROCESSED", "PROCESSED", "FAILED"):
+            totals[row["STATUS"].replace(" ", "_")] += row["RECORDS"]
+    return status
 
 def create_pipeline_chart(stages, manual_stage, extraction_failed_stage):
     # Create the pipeline chart
@@ -618,24 +676,49 @@ def create_pipeline_chart(stages, manual_stage, extraction_failed_stage):
     )
     st.plotly_chart(fig, use_container_width=True)
 
-
-    st.caption("🔄 Dashboard refreshes every 5 seconds.")
-
     return fig
 
 
 def live_view_logic():
-    
-    # Refresh interval (5 minutes = 300 seconds)
-    refresh_interval = 300
+    # Determine table references based on selected form
+    if form_selection in model_registry:
+        model_name = form_selection
+        # Dynamically set the table data for the selected model
+        table_data = model_registry.get(model_name, {})
+        
+        if not table_data:
+            st.error(f"No table data found for model: {model_name}")
+            return
+    else:
+        st.error("Invalid Model selection.")
+        return
+
+    # Fetch data counts from relevant tables for each model
+    flattened_table, validated_table = get_table_names_for_model(model_name)
+
+    if not flattened_table or not validated_table:
+        st.error(f"Error: Missing required tables for model: {model_name}")
+        return
+
+    refresh_label = st.selectbox(
+        "🔄 Auto refresh",
+        list(LIVE_VIEW_REFRESH_OPTIONS),
+        index=list(LIVE_VIEW_REFRESH_OPTIONS).index("5 minutes"),
+        key="live_view_refresh",
+    )
+
+    # Only the charts rerun on the interval; the sidebar and the rest of the
+    # page stay as they are and navigation is never blocked
+    live_view_charts = st.fragment(run_every=LIVE_VIEW_REFRESH_OPTIONS[refresh_label])(live_view_status)
+    live_view_charts(model_name, refresh_label)
+
 
-    # Calculate the last 30 days range
+def live_view_status(model_name, refresh_label):
     now = datetime.now()
-    last_30_days = now - timedelta(days=30)
 
     try:
 
-        # Display the time range
+        # The counts cover every document, not a time range
         st.markdown(
             f"""
             <div style="
@@ -649,38 +732,20 @@ def live_view_logic():
                 position: relative; 
                 margin : 30px auto 20px auto ;
                 box-shadow: 1px 1px 3px #ddd;">
-                <strong>Time Range:</strong> {last_30_days.strftime('%Y-%m-%d %H:%M:%S')} - {now.strftime('%Y-%m-%d %H:%M:%S')}
+                <strong>All time, as of:</strong> {now.strftime('%Y-%m-%d %H:%M:%S')}
             </div>
             """,
             unsafe_allow_html=True
         )
-        # Determine table references based on selected form
-        if form_selection in model_names_list:
-            model_name = form_selection
-            # Dynamically set the table data for the selected model
-            table_data = tables.get(model_name, {})
-            
-            if not table_data:
-                st.error(f"No table data found for model: {model_name}")
-                return
-        else:
-            st.error("Invalid Model selection.")
-            return
 
-        # Fetch data counts from relevant tables for each model
-        flattened_table, validated_table = get_table_names_for_model(model_name, model_table_names)
-
-        if not flattened_table or not validated_table:
-            st.error(f"Error: Missing required tables for model: {model_name}")
-            return
-
-        # # Fetch data counts from relevant tables
-        waiting_count = fetch_table_data1(f"SELECT COUNT(*) FROM {tables['prefilter']} WHERE STATUS = 'NOT PROCESSED'")
-        preprocessed_count = fetch_table_data1(f"SELECT COUNT(*) FROM {tables['prefilter']} WHERE STATUS = 'PROCESSED'")
-        manual_review_count = fetch_table_data1(f"SELECT COUNT(*) FROM {tables['prefilter']} WHERE STATUS = 'FAILED'")
-        extraction_count = fetch_table_data1(f"SELECT COUNT(*) FROM {tables['extraction']}")
-        extraction_failed_count = fetch_table_data1(f"SELECT COUNT(*) FROM {flattened_table} WHERE STATUS = 'FAILED'")
-        validated_count = fetch_table_data1(f"SELECT COUNT(*) FROM {validated_table}")
+        # Stage counts and average times, shared with other viewers for a few seconds
+        status = fetch_pipeline_status(model_name)
+        waiting_count = status["PREFILTER"]["NOT_PROCESSED"]
+        preprocessed_count = status["PREFILTER"]["PROCESSED"]
+        manual_review_count = status["PREFILTER"]["FAILED"]
+        extraction_count = status["EXTRACTION"]["RECORDS"]
+        extraction_failed_count = status["FLATTEN"]["FAILED"]
+        validated_count = status["VALIDATED"]["RECORDS"]
         
         # Define colors based on status
         def get_color(status_count, status_type, is_processed=False, is_completed=False):
@@ -740,119 +805,17 @@ def live_view_logic():
         # Create the pipeline chart
         
         fig = create_pipeline_chart(stages, manual_stage, extraction_failed_stage)
+
+        if LIVE_VIEW_REFRESH_OPTIONS[refresh_label]:
+            st.caption(f"🔄 Live view refreshes every {refresh_label}. Last updated {now.strftime('%H:%M:%S')}.")
+        else:
+            st.caption(f"🔄 Auto refresh is off. Last updated {now.strftime('%H:%M:%S')}.")
         
         # Average processing time per table based on selected model
-        # queries = {
-        #     "Preprocessed": f"""
-        #                 SELECT 
-        #                     SUM(
-        #                         CASE 
-        #                             WHEN PROCESS_START_TIME <= PROCESS_END_TIME THEN DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)
-        #                             ELSE 0
-        #                         END
-        #                     ) AS TOTAL_SECONDS,
-        #                     COUNT(*) AS TOTAL_RECORDS
-        #                 FROM {tables['prefilter']}
-        #                 WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-        #             """,
-        #     "Extraction": f"""
-        #         SELECT 
-        #             SUM(DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)) AS TOTAL_SECONDS,
-        #             COUNT(*) AS TOTAL_RECORDS
-        #         FROM {tables['extraction']}
-        #         WHERE PROCESS_START_TIME IS
-        #         SELECT  NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-        #     """,
-        #     "Flattened": f"""
-        #             SUM(DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)) AS TOTAL_SECONDS,
-        #             COUNT(*) AS TOTAL_RECORDS
-        #         FROM {flattened_table}
-        #         WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-        #     """,
-
-        #     "Validated": f"""
-        #             SELECT 
-        #                 SUM(DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)) AS TOTAL_SECONDS,
-        #                 COUNT(*) AS TOTAL_RECORDS
-        #             FROM {validated_table}
-        #             WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-        #         """
-
-        # }
-
-        queries = {
-            "Preprocessed": f"""
-                SELECT 
-                    SUM(
-                        CASE 
-                            WHEN PROCESS_START_TIME <= PROCESS_END_TIME THEN DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)
-                            ELSE 0
-                        END
-                    ) AS TOTAL_SECONDS,
-                    COUNT(*) AS TOTAL_RECORDS
-                FROM {tables['prefilter']}
-                WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-            """,
-            "Extraction": f"""
-                SELECT 
-                    SUM(DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)) AS TOTAL_SECONDS,
-                    COUNT(*) AS TOTAL_RECORDS
-                FROM {tables['extraction']}
-                WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-            """,
-            "Flattened": f"""
-                SELECT 
-                    SUM(DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)) AS TOTAL_SECONDS,
-                    COUNT(*) AS TOTAL_RECORDS
-                FROM {flattened_table}
-                WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-            """,
-            "Validated": f"""
-                SELECT 
-                    SUM(DATEDIFF(second, PROCESS_START_TIME, PROCESS_END_TIME)) AS TOTAL_SECONDS,
-                    COUNT(*) AS TOTAL_RECORDS
-                FROM {validated_table}
-                WHERE PROCESS_START_TIME IS NOT NULL AND PROCESS_END_TIME IS NOT NULL;
-            """
-        }
-
-
-       # Initialize average times dictionary
-        # Initialize average times dictionary
         avg_times = {}
-        
-        # Iterate through the queries and execute them
-        for table, query in queries.items():
-            try:
-                # Execute the query
-                result = fetch_table_data(query)  # Replace with your actual query execution function
-        
-                # Safely handle the DataFrame result
-                if isinstance(result, pd.DataFrame) and not result.empty:
-                    if table == "Validated":  # Special handling for Validated table
-                        total_records = result.iloc[0]["TOTAL_RECORDS"] if "TOTAL_RECORDS" in result.columns else 0
-                        total_milliseconds = result.iloc[0]["TOTAL_MILLISECONDS"] if "TOTAL_MILLISECONDS" in result.columns else 0
-                        formatted_time = result.iloc[0]["FORMATTED_TIME"] if "FORMATTED_TIME" in result.columns else "0 min 0 sec 0 ms"
-        
-                        # Add formatted time and seconds to avg_times dictionary
-                        avg_times[table] = {
-                            "seconds": total_milliseconds / 1000 if total_records > 0 else 0,
-                            "formatted": formatted_time,
-                        }
-                    else:
-                        # Standard handling for other tables
-                        total_seconds = result.iloc[0]["TOTAL_SECONDS"] if "TOTAL_SECONDS" in result.columns else 0
-                        total_records = result.iloc[0]["TOTAL_RECORDS"] if "TOTAL_RECORDS" in result.columns else 0
-        
-                        # Calculate average time in seconds
-                        avg_time_seconds = total_seconds / total_records if total_records > 0 else 0
-                        avg_times[table] = avg_time_seconds
-                else:
-                    st.warning(f"No data returned for {table}. Please check the query or data source.")
-                    avg_times[table] = None  # Explicitly set None for tables with no data
-            except Exception as e:
-                avg_times[table] = None
-                st.error(f"Error fetching data for {table}: {str(e)}")
+        for table, stage in [("Preprocessed", "PREFILTER"), ("Extraction", "EXTRACTION"), ("Flattened", "FLATTEN"), ("Validated", "VALIDATED")]:
+            timed_records = status[stage]["TIMED_RECORDS"]
+            avg_times[table] = status[stage]["TOTAL_SECONDS"] / timed_records if timed_records > 0 else 0
         
         # Define colors for the bar chart
         custom_colors = {
@@ -865,14 +828,8 @@ def live_view_logic():
         # Prepare data for the bar chart
         chart_data = {
             "Table": list(avg_times.keys()),
-            "Average Time (Seconds)": [
-                avg_times[table]["seconds"] if isinstance(avg_times[table], dict) else avg_times[table]
-                for table in avg_times.keys()
-            ],
-            "Formatted Time": [
-                avg_times[table]["formatted"] if isinstance(avg_times[table], dict) else ""
-                for table in avg_times.keys()
-            ],
+            "Average Time (Seconds)": list(avg_times.values()),
+            "Formatted Time": [f"{seconds:.1f} sec" for seconds in avg_times.values()],
         }
         
         df_chart = pd.DataFrame(chart_data)
@@ -883,7 +840,7 @@ def live_view_logic():
             x="Table",
             y="Average Time (Seconds)",
             title="Average Processing Time per Table",
-            text="Formatted Time",  # Display formatted time for Validated table
+            text="Formatted Time",
             color="Table",  # Use the custom color map for the 'Table' column
             color_discrete_map=custom_colors,  # Apply custom colors
         )
@@ -903,10 +860,6 @@ def live_view_logic():
     except Exception as e:
         st.error(f"Error fetching live data: {str(e)}")
 
-    # Refresh the dashboard
-    time.sleep(refresh_interval)
-    st.rerun()
-
 
 
 # Convert fractional minutes to "X min Y sec" format
@@ -930,11 +883,11 @@ def manual_review_section():
         st.markdown("---")
 
         # Dynamically fetch the table and stage based on the selected form
-        if form_selection in model_names_list:  # Check if the form selection is in the model names list
+        if form_selection in model_registry:  # Check if the form selection is in the model names list
             model_name = form_selection
         
             # Dynamically fetch the table and stage from the tables dictionary
-            table_data = tables.get(model_name, {})
+            table_data = model_registry.get(model_name, {})
             
             if not table_data:
                 st.error(f"No table data found for model: {model_name}")
@@ -968,16 +921,16 @@ def manual_review_section():
         st.markdown("---")  # Horizontal line for separation
 
         # Dynamically fetch the table and stage based on the selected form
-        if form_selection in model_names_list:
+        if form_selection in model_registry:
             model_name = form_selection
             # Dynamically fetch the table for the selected model
-            table_data = tables.get(model_name, {})
+            table_data = model_registry.get(model_name, {})
             
             if not table_data:
                 st.error(f"No table data found for model: {model_name}")
                 return
 
-            flattened_table = table_data['flattened'] 
+            flattened_table = table_data['FLATTEN_TABLE']
         else:
             st.error("Invalid model selection.")
             return
@@ -1064,6 +1017,11 @@ def handle_manual_review(query, stage_name, tab_key):
     # Fetch data
     data_df = fetch_table_data(query)
 
+    # Result of the last revert/ignore action, kept across its rerun
+    action_message = st.session_state.pop(f"stage_action_message_{tab_key}", None)
+    if action_message:
+        st.success(action_message)
+
     if not data_df.empty:
         st.write(f"### {tab_key} Records")
 
@@ -1120,6 +1078,41 @@ def paginate_and_display(filtered_df, tab_key, stage_name):
             if st.button("Next ⏭️", key=f"next_{tab_key}"):
                 st.session_state[f"current_page_{tab_key}"] += 1
 
+    # Bulk actions over every filtered document, not just the current page
+    bulk_files = filtered_df['FILENAME'].unique().tolist()
+    # Bumped after each action so the selection starts empty again
+    bulk_version = st.session_state.get(f"bulk_version_{tab_key}", 0)
+    with st.expander(f"Bulk actions ({len(bulk_files)} documents)"):
+        select_all = st.checkbox("Select all filtered documents", key=f"bulk_all_{tab_key}_{bulk_version}")
+        if select_all:
+            selected_files = bulk_files
+        else:
+            selected_files = st.multiselect(
+                "Choose documents",
+                options=bulk_files,
+                placeholder="Select documents...",
+                key=f"bulk_select_{tab_key}_{bulk_version}"
+            )
+        bulk1, bulk2 = st.columns([2, 2])
+        with bulk1:
+            bulk_revert_clicked = st.button(
+                label=f"🔄 Send {len(selected_files)} documents for re-processing",
+                key=f"bulk_revert_{tab_key}",
+                disabled=not selected_files,
+                use_container_width=True
+            )
+        with bulk2:
+            bulk_ignore_clicked = st.button(
+                label=f"🚫 Remove {len(selected_files)} documents from pipeline",
+                key=f"bulk_ignore_{tab_key}",
+                disabled=not selected_files,
+                use_container_width=True
+            )
+        if bulk_revert_clicked:
+            process_stage_action(selected_files, stage_name, action="revert", tab_key=tab_key)
+        if bulk_ignore_clicked:
+            process_stage_action(selected_files, stage_name, action="ignore", tab_key=tab_key)
+
     # Slice the DataFrame for the current page
     start_idx = (st.session_state[f"current_page_{tab_key}"] - 1) * records_per_page
     end_idx = min(start_idx + records_per_page, total_records)
@@ -1171,9 +1164,9 @@ def show_pdf_viewer(data_df, stage_name, tab_key):
 
         # Handle actions for buttons
         if revert_button_clicked:
-            process_stage_action(selected_file, stage_name, action="revert")
+            process_stage_action([selected_file], stage_name, action="revert", tab_key=tab_key)
         if ignore_button_clicked:
-            process_stage_action(selected_file, stage_name, action="ignore")
+            process_stage_action([selected_file], stage_name, action="ignore", tab_key=tab_key)
 
         # Display PDF if selected
         try:
@@ -1205,53 +1198,80 @@ def show_pdf_viewer(data_df, stage_name, tab_key):
 
 
 
-def process_stage_action(file_name, stage_name, action):
+def revert_targets(file_names, model):
+    """
+    Group documents by where a revert puts them in the source stage, so the
+    model's MODEL_METADATA routing picks them up again: under its FOLDER_NAME,
+    else under its PATH_PREFIX. Documents already on such a path, and those
+    of models routed by FILE_PATTERN only, keep their path.
+    """
+    if model.get("FOLDER_NAME"):
+        route = model["FOLDER_NAME"]
+        routed = lambda name: name.split("/")[0] == route
+    elif model.get("PATH_PREFIX"):
+        route = model["PATH_PREFIX"].strip("/")
+        routed = lambda name: name.startswith(model["PATH_PREFIX"])
+    else:
+        return {doc_stage: list(file_names)}
+
+    targets = {}
+    for name in file_names:
+        targets.setdefault(doc_stage if routed(name) else f"{doc_stage}/{route}", []).append(name)
+    return targets
+
+
+def process_stage_action(file_names, stage_name, action, tab_key):
     """
-    Handles the revert or ignore actions for a file in a specific stage.
+    Handles the revert or ignore actions for a list of files in a specific stage.
+    The stored procedure checks the files against the stage directory table and
+    moves them; the history rows and prefilter deletes are one batch each.
     """
     try:
         # Normalize the stage name
         stage_name = stage_name.strip('@').upper()
-        
-        # Check if the file exists in the stage
-        list_manual_review_query = f"LIST @{stage_name}/;"
-        manual_review_files = session.sql(list_manual_review_query).collect()
-        stage_filenames = [file['name'].split('/')[-1] for file in manual_review_files]
-
-        # Normalize the file_name (strip folder prefix)
-        normalized_file_name = file_name.split('/')[-1]  
 
-        # Check if the normalized file name exists in the stage
-        if normalized_file_name not in stage_filenames:
-            st.error(f"File {file_name} not found in the {stage_name} stage.")
+        if action == "revert":
+            targets = revert_targets(file_names, model_registry.get(form_selection, {}))
+        else:
+            targets = {ignored_stage: list(file_names)}
+        moved, missing = [], []
+        for target, names in targets.items():
+            result = session.call(f"{db_name}.{schema_name}.MOVE_REVIEW_FILES", target, names)
+            outcome = json.loads(result) if isinstance(result, str) else result
+            moved += outcome["moved"]
+            missing += outcome["missing"]
+
+        if missing:
+            st.error(f"{len(missing)} files not found in the {stage_name} stage: {', '.join(missing[:10])}")
+        if not moved:
             return
 
-        # Perform the action
-        proc_call = f"""
-            CALL {db_name}.{schema_name}.{"MOVEFILES_TO_SOURCE" if action == "revert" else "IGNOREFILES_TO_STAGE"}('{file_name}');
-        """
-        # st.write(proc_call)
-        session.sql(proc_call).collect()
-
-        log_query = f"""
-            INSERT INTO {db_name}.{schema_name}.{manual_history_log}
-            (FILENAME, ACTION, TIMESTAMP, USER_NAME, COMMENTS)
-            VALUES ('{file_name}', '{'Moved to DOC_STAGE' if action == "revert" else 'Ignored and moved to IGNORED_DOCS'}',
-                    CURRENT_TIMESTAMP, CURRENT_USER, 'Action completed successfully.');
-        """
-        session.sql(log_query).collect()
-
-        delete_query = f"""
-            DELETE FROM {db_name}.{schema_name}.{tables['prefilter']}
-            WHERE FILENAME = '{file_name}';
-        """
-        session.sql(delete_query).collect()
-
-        st.success(f"File {file_name} successfully processed.")
-        time.sleep(3)
+        session.sql("BEGIN").collect()
+        try:
+            session.sql(f"""
+                INSERT INTO {db_name}.{schema_name}.{manual_history_log}
+                (FILENAME, ACTION, TIMESTAMP, USER_NAME, COMMENTS)
+                SELECT value::VARCHAR, ?, CURRENT_TIMESTAMP, CURRENT_USER, 'Action completed successfully.'
+                FROM TABLE(FLATTEN(INPUT => PARSE_JSON(?)))
+            """, params=[
+                'Moved to DOC_STAGE' if action == "revert" else 'Ignored and moved to IGNORED_DOCS',
+                json.dumps(moved)
+            ]).collect()
+
+            session.sql(f"""
+                DELETE FROM {db_name}.{schema_name}.{tables['prefilter']}
+                WHERE FILENAME IN (SELECT value::VARCHAR FROM TABLE(FLATTEN(INPUT => PARSE_JSON(?))))
+            """, params=[json.dumps(moved)]).collect()
+            session.sql("COMMIT").collect()
+        except Exception:
+            session.sql("ROLLBACK").collect()
+            raise
+
+        st.session_state[f"stage_action_message_{tab_key}"] = f"{len(moved)} files successfully processed."
+        st.session_state[f"bulk_version_{tab_key}"] = st.session_state.get(f"bulk_version_{tab_key}", 0) + 1
         st.rerun()
     except Exception as e:
-        st.error(f"Failed to process file {file_name}: {str(e)}")
+        st.error(f"Failed to process files: {str(e)}")
 
 
 
@@ -1259,10 +1279,10 @@ def process_stage_action(file_name, stage_name, action):
 def score_threshold_section():
 
     # Dynamically fetch the table and stage based on the selected form
-    if form_selection in model_names_list:
+    if form_selection in model_registry:
         model_name = form_selection
         # Dynamically fetch the table for the selected model
-        table_data = tables.get(model_name, {})
+        table_data = model_registry.get(model_name, {})
         
         if not table_data:
             st.error(f"No table data found for model: {model_name}")
@@ -1312,16 +1332,16 @@ def validated_records_section(form_selection):
     """
 
     # Dynamically fetch the table and stage based on the selected form
-    if form_selection in model_names_list:
+    if form_selection in model_registry:
         model_name = form_selection
         # Dynamically fetch the table for the selected model
-        table_data = tables.get(model_name, {})
+        table_data = model_registry.get(model_name, {})
         
         if not table_data:
             st.error(f"No table data found for model: {model_name}")
             return
 
-        validated_table = table_data['validated'] 
+        validated_table = table_data['VALIDATED_TABLE']
     else:
         st.error("Invalid model selection.")
         return
@@ -1447,6 +1467,8 @@ def metadata_table_selection():
                 # Commit the changes if necessary
                 try:
                     session.sql("COMMIT").collect()
+                    # Every session reloads the model registry on its next rerun
+                    metadata_version()["version"] += 1
                     st.success("Model Data updated successfully!")
                 except Exception as e:
                     st.error(f"Error committing changes: {str(e)}")
@@ -0,0 +1,477 @@
+"""
+End-to-end load simulation of the task graph in simulated time.
+
+A burst of synthetic documents, modeled on sample_docs/ (file names, size
+per page, page counts) with a tail of long scanned files and some corrupt,
+damaged and zero-byte ones, lands on @INVOICE_DOCS of the in-memory
+stand-in. The task graph runs as deployed: PREPROCESSING every TICK when
+its streams have data, then EXTRACT_DATA (EXTRACT_CONTROLLER ->
+HANDLE_PDF_FILES), then MANUAL_CHECKUP_FILES and FLATTEN_DATA, then
+VALIDATE_DATA. A graph run that is still going at the next tick makes the
+tick skip, as Snowflake does for a root task that would overlap.
+EXTRACT_LEASE_RECOVERY calls EXTRACT_CONTROLLER every 30 minutes on ticks
+where the graph does not run.
+
+The procedures run unchanged on a simulated clock: every round trip costs
+--statement-ms (--file-ms for a stage file transfer), PREDICT takes
+--predict-seconds plus --predict-seconds-per-page with lognormal jitter,
+and the procedures' own sleeps and timers read the same clock.
+MANAGE_MANUAL_REVIEW_FILES is JavaScript, so its chunked moves are
+replayed in Python with the same round trips.
+
+Reports queue depth over time, the drain time and latency percentiles for
+every hop a document makes.
+
+    python benchmarks/load_sim.py
+    python benchmarks/load_sim.py --documents 50000 --burst-minutes 10 --corrupt-rate 0.02
+    python benchmarks/load_sim.py --documents 5000 --predict-seconds 8 --output sim.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import re
+import threading
+import time
+import types
+from pathlib import Path
+
+# Imported before the procedures, which are loaded with a simulated time
+# module, so these libraries keep the real one
+import numpy  # noqa: F401
+import pandas  # noqa: F401
+import PyPDF2  # noqa: F401
+import pypdfium2  # noqa: F401
+import concurrent.futures  # noqa: F401
+
+from procedures import load_procedure, seed_rows
+from standin import StandInSession, Warehouse
+from synthetic import SyntheticFile, model_thresholds, prediction, seeded_rng
+
+SAMPLE_DOCS = Path(__file__).resolve().parent.parent / "sample_docs"
+MANUAL_MOVE_CHUNK = 500
+# Schedule of the standalone EXTRACT_LEASE_RECOVERY task
+LEASE_RECOVERY_SECONDS = 30 * 60
+HOPS = [
+    ("preprocess", "landed", "preprocessed"),
+    ("extract", "preprocessed", "extracted"),
+    ("flatten", "extracted", "flattened"),
+    ("validate", "flattened", "validated"),
+    ("manual review", "preprocessed", "manual review"),
+    ("end to end", "landed", "validated"),
+]
+
+
+class SimClock:
+    """
+    Simulated seconds since the start of the burst. ON_ADVANCE is called
+    with the new time whenever the clock moves forward.
+    """
+
+    def __init__(self, on_advance=None):
+        self.now = 0.0
+        self.on_advance = on_advance
+        self.lock = threading.RLock()
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        with self.lock:
+            self.now += seconds
+            if self.on_advance:
+                self.on_advance(self.now)
+
+    def time_module(self):
+        """
+        A stand-in for the time module whose clocks and sleep use this clock.
+        """
+        module = types.ModuleType("time")
+        module.__dict__.update({name: getattr(time, name) for name in dir(time) if not name.startswith("__")})
+        module.time = module.monotonic = module.perf_counter = self
+        module.sleep = self.advance
+        return module
+
+
+class SimSession(StandInSession):
+    """
+    A stand-in session whose round trips take simulated time. Transfers
+    made from worker threads share PARALLEL_TRANSFERS lanes.
+    """
+
+    def __init__(self, warehouse, clock, statement_seconds, file_seconds, parallel_transfers=1):
+        super().__init__(warehouse)
+        self.clock = clock
+        self.statement_seconds = statement_seconds
+        self.file_seconds = file_seconds
+        self.parallel_transfers = max(1, parallel_transfers)
+
+    def count(self, kind):
+        super().count(kind)
+        if kind in ("GET", "PUT"):
+            lanes = 1 if threading.current_thread() is threading.main_thread() else self.parallel_transfers
+            self.clock.advance(self.file_seconds / lanes)
+        else:
+            self.clock.advance(self.statement_seconds)
+
+
+class PredictEmulator:
+    """
+    Document AI PREDICT: latency of SECONDS plus SECONDS_PER_PAGE per page,
+    scaled by lognormal JITTER, and results scored against the model's
+    thresholds. ERROR_RATE of the calls fail.
+    """
+
+    def __init__(self, seconds, seconds_per_page, jitter, error_rate, low_score_rate, seed=0):
+        thresholds = seed_rows("SCORE_THRESHOLD")
+        self.fields = {
+            model_name: model_thresholds(thresholds, model_name)
+            for model_name in {row["MODEL_NAME"] for row in thresholds}
+        }
+        self.seconds = seconds
+        self.seconds_per_page = seconds_per_page
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.low_score_rate = low_score_rate
+        self.seed = seed
+
+    @staticmethod
+    def pages(relative_path, data):
+        pages = getattr(data, "pages", None)
+        if pages is None:
+            # Split chunks are named <lease>/<rowid>/<index>_pages_<first>-<last>.pdf
+            chunk = re.search(r"_pages_(\d+)-(\d+)\.pdf$", relative_path)
+            pages = int(chunk.group(2)) - int(chunk.group(1)) + 1 if chunk else 1
+        return pages
+
+    def __call__(self, model_name, relative_path, data):
+        rng = seeded_rng("predict", relative_path, self.seed)
+        if rng.random() < self.error_rate:
+            raise RuntimeError("Document AI could not process the document")
+        return prediction(self.fields[model_name], rng, low_score_rate=self.low_score_rate)
+
+    def delay(self, model_name, relative_path, data):
+        rng = seeded_rng("latency", relative_path, self.seed)
+        base = self.seconds + self.seconds_per_page * self.pages(relative_path, data)
+        return base * math.exp(rng.gauss(0, self.jitter))
+
+
+def sample_profile(sample_dir=SAMPLE_DOCS):
+    """
+    File name prefixes, bytes per page and page counts of the sample
+    documents.
+    """
+    prefixes, bytes_per_page, pages = [], [], []
+    for path in sorted(sample_dir.glob("*.pdf")):
+        count = len(PyPDF2.PdfReader(str(path)).pages)
+        prefixes.append(re.match(r"(.*?)POPO-", path.name).group(1) if "POPO-" in path.name else path.stem + "-")
+        bytes_per_page.append(path.stat().st_size / count)
+        pages.append(count)
+    return prefixes, bytes_per_page, pages
+
+
+def arrivals(args):
+    """
+    (arrival_time, relative_path, file) for the burst, in arrival order.
+    Arrival times are uniform over the burst window.
+    """
+    rng = seeded_rng("arrivals", args.seed)
+    prefixes, bytes_per_page, sample_pages = sample_profile()
+    times = sorted(rng.uniform(0, args.burst_minutes * 60) for _ in range(args.documents))
+    for i, arrival in enumerate(times):
+        name = f"{rng.choice(prefixes)}SIM-{args.seed}-{i:07d}.pdf"
+        roll = rng.random()
+        if roll < args.zero_byte_rate:
+            file = SyntheticFile("empty")
+        elif roll < args.zero_byte_rate + args.corrupt_rate:
+            file = SyntheticFile("corrupt", padding=int(rng.choice(bytes_per_page)), document_id=name)
+        elif roll < args.zero_byte_rate + args.corrupt_rate + args.damaged_rate:
+            pages = rng.randint(*args.long_pages)
+            size = pages * args.long_page_kb * 1024 * rng.lognormvariate(0, args.size_jitter)
+            file = SyntheticFile("damaged", pages=pages, padding=int(size), document_id=name)
+        elif rng.random() < args.long_rate:
+            pages = rng.randint(*args.long_pages)
+            size = pages * args.long_page_kb * 1024 * rng.lognormvariate(0, args.size_jitter)
+            file = SyntheticFile("pdf", pages=pages, padding=int(size), document_id=name)
+        else:
+            pages = rng.choice(sample_pages)
+            size = pages * rng.choice(bytes_per_page) * rng.lognormvariate(0, args.size_jitter)
+            file = SyntheticFile("pdf", pages=pages, padding=int(size), document_id=name)
+        yield arrival, name, file
+
+
+class Simulation:
+
+    def __init__(self, args):
+        self.args = args
+        self.pending = list(arrivals(args))
+        self.pending.reverse()
+        self.landed = 0
+        self.clock = SimClock(self.land)
+        self.predict = PredictEmulator(
+            args.predict_seconds, args.predict_seconds_per_page, args.predict_jitter,
+            args.predict_error_rate, args.low_score_rate, args.seed,
+        )
+        self.warehouse = Warehouse(self.predict, clock=self.clock, predict_delay=self.predict.delay)
+
+        simulated_time = self.clock.time_module()
+        self.procedures = {
+            name: load_procedure(name, modules={"time": simulated_time})
+            for name in ("COUNT_PDF_PAGES_PROC", "EXTRACT_CONTROLLER", "HANDLE_PDF_FILES",
+                         "LOAD_MODEL_FLATTEN", "LOAD_MODEL_VALIDATED")
+        }
+        self.warehouse.procedures["HANDLE_PDF_FILES"] = self.procedures["HANDLE_PDF_FILES"]
+        self.page_count_workers = self.procedures["COUNT_PDF_PAGES_PROC"].__globals__["PAGE_COUNT_WORKERS"]
+
+        self.task_runs = {}
+        self.depths = []
+        self.next_sample = 0.0
+
+    def land(self, now):
+        """
+        Put every file whose arrival time has passed on the stage, sampling
+        the queue depths at every --sample-seconds boundary on the way.
+        Worker threads of a procedure leave the sampling to the main thread.
+        """
+        if threading.current_thread() is threading.main_thread():
+            while self.next_sample <= now:
+                self.add_arrivals(self.next_sample)
+                self.depths.append(dict(self.depth(), minute=round(self.next_sample / 60, 2)))
+                self.next_sample += self.args.sample_seconds
+        self.add_arrivals(now)
+
+    def add_arrivals(self, now):
+        due = []
+        while self.pending and self.pending[-1][0] <= now:
+            _, name, file = self.pending.pop()
+            due.append((name, file))
+        if due:
+            self.warehouse.add_files(due)
+            self.landed += len(due)
+
+    def session(self, parallel_transfers=1):
+        return SimSession(
+            self.warehouse, self.clock, self.args.statement_ms / 1000, self.args.file_ms / 1000, parallel_transfers
+        )
+
+    def run_task(self, task, body):
+        started = self.clock()
+        with contextlib.redirect_stdout(io.StringIO()):
+            body()
+        self.task_runs.setdefault(task, []).append(self.clock() - started)
+
+    # -- what the streams in the tasks' WHEN clauses see
+
+    def preprocess_stream_has_data(self):
+        return bool(self.warehouse.preprocess_stream)
+
+    def prefilter_stream_has_data(self):
+        return bool(self.warehouse.prefilter_stream)
+
+    def extraction_stream_has_data(self):
+        return bool(self.warehouse.extraction_stream)
+
+    # -- task bodies
+
+    def manual_checkup(self):
+        """
+        MANAGE_MANUAL_REVIEW_FILES: one query, then per chunk of files a
+        MOVE_STAGE_FILES call (a COPY FILES and a REMOVE), an UPDATE to
+        FAILED and a run log row.
+        """
+        session = self.session()
+        session.count("SELECT")
+        warehouse = self.warehouse
+        rows = sorted(
+            (row for row in warehouse.prefilter.values() if row["STATUS"] == "MANUAL REVIEW"),
+            key=lambda row: row["ROWID"],
+        )
+        source, target = warehouse.stages["INVOICE_DOCS"], warehouse.stages["MANUAL_REVIEW"]
+        for i in range(0, len(rows), MANUAL_MOVE_CHUNK):
+            for kind in ("CALL", "COPY", "REMOVE", "UPDATE", "INSERT"):
+                session.count(kind)
+            for row in rows[i:i + MANUAL_MOVE_CHUNK]:
+                if row["FILENAME"] in source:
+                    target[row["FILENAME"]] = source.pop(row["FILENAME"])
+                    row.update(STATUS="FAILED", COMMENT="File moved to manual review.")
+                    warehouse.changed_prefilter(row)
+                    warehouse.reached(row["FILENAME"], "manual review")
+
+    def graph_run(self):
+        """
+        One run of the PREPROCESSING task graph, starting now. Sibling
+        tasks start together; the graph ends with the last of them.
+        """
+        procedures = self.procedures
+        self.run_task("PREPROCESSING", lambda: procedures["COUNT_PDF_PAGES_PROC"](self.session(self.page_count_workers)))
+        self.run_task("EXTRACT_DATA", lambda: procedures["EXTRACT_CONTROLLER"](self.session()))
+
+        extracted_at = self.clock()
+        self.run_task("MANUAL_CHECKUP_FILES", self.manual_checkup)
+        manual_done = self.clock()
+        self.clock.now = extracted_at
+        if self.extraction_stream_has_data():
+            self.run_task("FLATTEN_DATA", lambda: procedures["LOAD_MODEL_FLATTEN"](self.session()))
+            self.run_task("VALIDATE_DATA", lambda: procedures["LOAD_MODEL_VALIDATED"](self.session()))
+        self.clock.now = max(self.clock.now, manual_done)
+
+    # -- queue depth
+
+    def depth(self):
+        warehouse = self.warehouse
+        statuses = {}
+        for row in warehouse.prefilter.values():
+            statuses[row["STATUS"]] = statuses.get(row["STATUS"], 0) + 1
+        return {
+            "minute": round(self.clock() / 60, 2),
+            "arrived": self.landed,
+            "preprocess": len(warehouse.preprocess_stream) + len(warehouse.inbox),
+            "extract": statuses.get("NOT PROCESSED", 0) + statuses.get("IN PROGRESS", 0),
+            "manual review": statuses.get("MANUAL REVIEW", 0),
+            "flatten": len(warehouse.flatten_queue) + sum(
+                1 for _, _, status in warehouse.extraction_stream if status == "NOT PROCESSED"
+            ),
+            "validate": sum(len(warehouse.validated_arrivals(table)) for table in warehouse.flatten_streams),
+        }
+
+    def drained(self, depth):
+        return not self.pending and not any(depth[queue] for queue in ("preprocess", "extract", "manual review", "flatten", "validate"))
+
+    def run(self):
+        """
+        Tick the root task until every queue is empty or --max-hours pass.
+        Returns the drain time in seconds, or None.
+        """
+        tick = self.args.tick_seconds
+        limit = self.args.max_hours * 3600
+        next_tick = 0.0
+        next_recovery = LEASE_RECOVERY_SECONDS
+        while next_tick <= limit:
+            if self.clock() < next_tick:
+                self.clock.advance(next_tick - self.clock())
+            depth = self.depth()
+            if self.drained(depth) and self.landed:
+                self.depths.append(depth)
+                return self.clock()
+            if self.preprocess_stream_has_data() or self.prefilter_stream_has_data():
+                self.graph_run()
+            elif self.clock() >= next_recovery:
+                self.run_task("EXTRACT_LEASE_RECOVERY", lambda: self.procedures["EXTRACT_CONTROLLER"](self.session()))
+            while next_recovery <= self.clock():
+                next_recovery += LEASE_RECOVERY_SECONDS
+            # The next run starts on the first tick after this one finished
+            next_tick = max(next_tick + tick, math.ceil(self.clock() / tick) * tick)
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+    return {"count": len(ordered), "p50": at(0.5), "p90": at(0.9), "p99": at(0.99), "max": round(ordered[-1], 1)}
+
+
+def hop_latencies(timeline):
+    latencies = {}
+    for hop, start, end in HOPS:
+        latencies[hop] = percentiles([
+            events[end] - events[start] for events in timeline.values() if start in events and end in events
+        ])
+    return latencies
+
+
+def outcome_counts(warehouse):
+    counts = {}
+    for row in warehouse.prefilter.values():
+        counts[row["STATUS"]] = counts.get(row["STATUS"], 0) + 1
+    for table, rows in warehouse.flatten.items():
+        for row in rows:
+            key = f"{table} {row['STATUS']}"
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def print_report(simulation, drain_seconds, report_minutes):
+    queues = ["arrived", "preprocess", "extract", "manual review", "flatten", "validate"]
+    print("Queue depth")
+    print(f"{'minute':>8}  " + "  ".join(f"{queue:>13}" for queue in queues))
+    shown = None
+    for depth in simulation.depths:
+        last = depth is simulation.depths[-1] and depth["minute"] != shown
+        if shown is None or depth["minute"] - shown >= report_minutes or last:
+            print(f"{depth['minute']:>8.0f}  " + "  ".join(f"{depth[queue]:>13}" for queue in queues))
+            shown = depth["minute"]
+
+    print()
+    if drain_seconds is None:
+        print(f"Not drained after {simulation.args.max_hours} hours")
+    else:
+        print(f"Drained in {drain_seconds / 60:.1f} minutes")
+
+    print()
+    print(f"{'latency (s)':<15}  {'count':>7}  {'p50':>9}  {'p90':>9}  {'p99':>9}  {'max':>9}")
+    for hop, stats in hop_latencies(simulation.warehouse.timeline).items():
+        if stats:
+            print(f"{hop:<15}  {stats['count']:>7}  {stats['p50']:>9.1f}  {stats['p90']:>9.1f}  {stats['p99']:>9.1f}  {stats['max']:>9.1f}")
+
+    print()
+    print(f"{'task':<22}  {'runs':>5}  {'p50 s':>8}  {'max s':>8}")
+    for task, durations in simulation.task_runs.items():
+        stats = percentiles(durations)
+        print(f"{task:<22}  {stats['count']:>5}  {stats['p50']:>8.1f}  {stats['max']:>8.1f}")
+
+    print()
+    print("Outcomes: " + ", ".join(f"{key} {count}" for key, count in sorted(outcome_counts(simulation.warehouse).items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--burst-minutes", type=float, default=10)
+    parser.add_argument("--corrupt-rate", type=float, default=0.02)
+    parser.add_argument("--zero-byte-rate", type=float, default=0.002)
+    parser.add_argument("--damaged-rate", type=float, default=0.001,
+                        help="long files whose pages cannot be read; those large enough to be split go to manual review")
+    parser.add_argument("--long-rate", type=float, default=0.01, help="scanned files with --long-pages pages")
+    parser.add_argument("--long-pages", type=int, nargs=2, default=[10, 60], metavar=("MIN", "MAX"))
+    parser.add_argument("--long-page-kb", type=float, default=120,
+                        help="size per page of scanned files; over 3 MB and 25 pages a file is split")
+    parser.add_argument("--size-jitter", type=float, default=0.25, help="lognormal sigma of bytes per page")
+    parser.add_argument("--predict-seconds", type=float, default=3.0)
+    parser.add_argument("--predict-seconds-per-page", type=float, default=0.5)
+    parser.add_argument("--predict-jitter", type=float, default=0.3, help="lognormal sigma of PREDICT latency")
+    parser.add_argument("--predict-error-rate", type=float, default=0.0)
+    parser.add_argument("--low-score-rate", type=float, default=0.02)
+    parser.add_argument("--statement-ms", type=float, default=50)
+    parser.add_argument("--file-ms", type=float, default=20)
+    parser.add_argument("--tick-seconds", type=float, default=60, help="PREPROCESSING schedule")
+    parser.add_argument("--sample-seconds", type=float, default=60, help="queue depth sampling interval")
+    parser.add_argument("--max-hours", type=float, default=48)
+    parser.add_argument("--report-minutes", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    simulation = Simulation(args)
+    started = time.perf_counter()
+    drain_seconds = simulation.run()
+    print_report(simulation, drain_seconds, args.report_minutes)
+    print(f"\nSimulated in {time.perf_counter() - started:.0f}s")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "arguments": {key: value for key, value in vars(args).items() if key != "output"},
+            "drain_seconds": drain_seconds,
+            "queue_depth": simulation.depths,
+            "latency_seconds": hop_latencies(simulation.warehouse.timeline),
+            "task_run_seconds": {task: percentiles(durations) for task, durations in simulation.task_runs.items()},
+            "outcomes": outcome_counts(simulation.warehouse),
+        }, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
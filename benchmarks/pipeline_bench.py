@@ -0,0 +1,267 @@
+"""
+Benchmark of the pipeline stored procedures against the in-memory stand-in.
+
+Loads COUNT_PDF_PAGES_PROC, HANDLE_PDF_FILES, LOAD_MODEL_FLATTEN and
+LOAD_MODEL_VALIDATED from the deploy script and runs each stage until it
+drains a synthetic corpus of Invoice and Purchase PDFs, with a fake
+!PREDICT. flatten-python repeats the flatten stage with the set-based
+statements failing, so it measures the record-by-record path.
+
+For every corpus size and stage it reports documents per second of handler
+time (time inside the stand-in is excluded), round trips to the warehouse
+per document and, in a second traced pass, peak Python memory. Results are
+written to benchmarks/results/<commit>.json; --compare prints the change
+between two result files.
+
+    python benchmarks/pipeline_bench.py
+    python benchmarks/pipeline_bench.py --documents 1000 --no-memory
+    python benchmarks/pipeline_bench.py --compare results/0ae4239.json results/1a2b3c4.json
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+# docai_common imports numpy and pandas on first use; import them here so
+# neither the import time nor its memory is counted against a stage
+import numpy  # noqa: F401
+import pandas  # noqa: F401
+
+from procedures import load_procedure, seed_rows
+from standin import StandInSession, Warehouse
+from synthetic import model_thresholds, pdf_bytes, prediction, seeded_rng
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+STAGES = ["preprocess", "extract", "flatten", "flatten-python", "validate"]
+PAGE_COUNTS = (1, 1, 1, 2, 2, 3, 4, 6, 12, 30)
+MAX_RUNS = 10000
+
+
+def corpus(count, seed=0):
+    """
+    COUNT files alternating between the INVOICE_MODEL and PURCHASE_MODEL
+    name patterns, mostly short with a tail of 12 and 30 page files. All
+    stay under the 3 MB split threshold.
+    """
+    rng = seeded_rng("corpus", seed)
+    for i in range(count):
+        prefix = "INV-" if i % 2 == 0 else "PURCHASES_"
+        yield f"{prefix}{seed}-{i:07d}.pdf", pdf_bytes(rng.choice(PAGE_COUNTS), rng.randint(0, 4096), str(i))
+
+
+def fake_predict(seed=0):
+    thresholds = seed_rows("SCORE_THRESHOLD")
+    fields = {model_name: model_thresholds(thresholds, model_name) for model_name in {row["MODEL_NAME"] for row in thresholds}}
+
+    def predict(model_name, relative_path, data):
+        return prediction(fields[model_name], seeded_rng(relative_path, seed))
+    return predict
+
+
+class Stage:
+    """
+    A procedure and the condition under which its stage has drained.
+    """
+
+    def __init__(self, procedure, drained, prepare=None):
+        self.procedure = procedure
+        self.drained = drained
+        self.prepare = prepare
+
+
+def extraction_waiting(warehouse):
+    # HANDLE_PDF_FILES enqueues the stream's arrivals itself, so count them
+    # along with the queue's backlog
+    arrivals = any(status == "NOT PROCESSED" for _, status in warehouse.prefilter_stream)
+    return arrivals or warehouse.select_backlog(None, None)[0]["FILES"] > 0
+
+
+def flatten_waiting(warehouse):
+    return bool(warehouse.flatten_queue) or any(status == "NOT PROCESSED" for _, _, status in warehouse.extraction_stream)
+
+
+def validation_waiting(warehouse):
+    return any(warehouse.validated_arrivals(table) for table in warehouse.flatten_streams)
+
+
+def python_flatten(warehouse):
+    warehouse.set_based_flatten = False
+
+
+def stage_definitions():
+    return {
+        "preprocess": Stage("COUNT_PDF_PAGES_PROC", lambda w: not w.preprocess_stream and not w.inbox),
+        "extract": Stage("HANDLE_PDF_FILES", lambda w: not extraction_waiting(w)),
+        "flatten": Stage("LOAD_MODEL_FLATTEN", lambda w: not flatten_waiting(w)),
+        "flatten-python": Stage("LOAD_MODEL_FLATTEN", lambda w: not flatten_waiting(w), python_flatten),
+        "validate": Stage("LOAD_MODEL_VALIDATED", lambda w: not validation_waiting(w)),
+    }
+
+
+def run_stage(warehouse, stage, handler, documents, trace_memory):
+    """
+    Call the handler until the stage drains. Returns the stage's result
+    row; with TRACE_MEMORY only the peak memory is meaningful.
+    """
+    session = StandInSession(warehouse)
+    handler_seconds, runs = 0.0, 0
+    if trace_memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        while not stage.drained(warehouse):
+            if runs >= MAX_RUNS:
+                raise RuntimeError(f"{stage.procedure} did not drain in {MAX_RUNS} runs")
+            inside = session.standin_seconds
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                handler(session)
+            handler_seconds += time.perf_counter() - started - (session.standin_seconds - inside)
+            runs += 1
+        peak = tracemalloc.get_traced_memory()[1] - baseline if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        "documents": documents,
+        "runs": runs,
+        "handler_seconds": round(handler_seconds, 4),
+        "standin_seconds": round(session.standin_seconds, 4),
+        "documents_per_second": round(documents / handler_seconds, 1) if handler_seconds else None,
+        "round_trips": session.round_trips,
+        "round_trips_per_document": round(session.round_trips / documents, 4),
+        "statements": dict(session.statements.most_common()),
+        "peak_mb": round(peak / 2 ** 20, 2) if trace_memory else None,
+    }
+
+
+def run_pipeline(documents, stages, seed, trace_memory):
+    """
+    Land the corpus and run every stage in order. flatten-python runs on a
+    copy of the warehouse taken before flatten, so both flatten stages see
+    the same records. Returns {stage: result}.
+    """
+    definitions = stage_definitions()
+    warehouse = Warehouse(fake_predict(seed))
+    warehouse.procedures["HANDLE_PDF_FILES"] = load_procedure("HANDLE_PDF_FILES")
+    warehouse.add_files(corpus(documents, seed))
+
+    results = {}
+    before_flatten = None
+    for name in STAGES:
+        target = warehouse
+        if name == "flatten" and "flatten-python" in stages:
+            if name not in stages:
+                # flatten-python drains the records for validate instead
+                continue
+            before_flatten = copy.deepcopy(warehouse)
+        if name == "flatten-python":
+            if name not in stages:
+                continue
+            target = before_flatten or warehouse
+        stage = definitions[name]
+        if stage.prepare:
+            stage.prepare(target)
+        result = run_stage(target, stage, load_procedure(stage.procedure), documents, trace_memory)
+        if name in stages:
+            results[name] = result
+    return results
+
+
+def git_revision():
+    root = Path(__file__).resolve().parent.parent
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{revision}-dirty" if dirty else revision
+
+
+def print_results(results):
+    print(f"{'docs':>7}  {'stage':<15}  {'runs':>5}  {'handler s':>9}  {'docs/s':>9}  {'trips':>7}  {'trips/doc':>9}  {'peak MB':>8}")
+    for row in results:
+        peak = f"{row['peak_mb']:>8.1f}" if row["peak_mb"] is not None else f"{'-':>8}"
+        rate = f"{row['documents_per_second']:>9.0f}" if row["documents_per_second"] else f"{'-':>9}"
+        print(
+            f"{row['documents']:>7}  {row['stage']:<15}  {row['runs']:>5}  {row['handler_seconds']:>9.3f}  "
+            f"{rate}  {row['round_trips']:>7}  {row['round_trips_per_document']:>9.3f}  {peak}"
+        )
+
+
+def compare(old_path, new_path):
+    """
+    Print the change in throughput, round trips and peak memory per stage
+    between two result files.
+    """
+    old, new = (json.loads(Path(path).read_text()) for path in (old_path, new_path))
+    baseline = {(row["documents"], row["stage"]): row for row in old["results"]}
+
+    def change(before, after):
+        if not before or after is None:
+            return f"{'-':>8}"
+        return f"{(after - before) / before * 100:>+7.1f}%"
+
+    print(f"{old['revision']} -> {new['revision']}")
+    print(f"{'docs':>7}  {'stage':<15}  {'docs/s':>8}  {'trips/doc':>9}  {'peak MB':>8}")
+    for row in new["results"]:
+        before = baseline.get((row["documents"], row["stage"]))
+        if before is None:
+            continue
+        print(
+            f"{row['documents']:>7}  {row['stage']:<15}  "
+            f"{change(before['documents_per_second'], row['documents_per_second'])}  "
+            f"{change(before['round_trips_per_document'], row['round_trips_per_document']):>9}  "
+            f"{change(before['peak_mb'], row['peak_mb'])}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced pass that measures peak memory")
+    parser.add_argument("--output", type=Path, help="result file, by default results/<commit>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for documents in args.documents:
+        timed = run_pipeline(documents, args.stages, args.seed, trace_memory=False)
+        traced = {} if args.no_memory else run_pipeline(documents, args.stages, args.seed, trace_memory=True)
+        for stage, result in timed.items():
+            result["peak_mb"] = traced[stage]["peak_mb"] if stage in traced else None
+            results.append(dict(result, stage=stage))
+        print_results([row for row in results if row["documents"] == documents])
+
+    revision = git_revision()
+    output = args.output or RESULTS_DIR / f"{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "revision": revision,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "results": results,
+    }, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Load code from the stored procedures in DOC_AI_QuickStart.SQL so the
+benchmarks run exactly what gets deployed.
+
+load_definitions executes only the requested top-level definitions,
+together with the module constants and imports they rely on.
+load_procedure executes a whole procedure body and returns its handler,
+to be called with a stand-in session. Snowflake-only imports are left out
+either way. The procedures' staged IMPORTS (docai_common.py) are importable
+once this module is, as they are in Snowflake.
+"""
+import ast
+import re
+import sys
+from pathlib import Path
+
+SQL_PATH = Path(__file__).resolve().parent.parent / "DOC_AI_QuickStart.SQL"
+
+# Directory of the modules the deploy script uploads to @DOCAI_CODE
+SHARED_CODE_DIR = SQL_PATH.parent
+if str(SHARED_CODE_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_CODE_DIR))
+
+SNOWFLAKE_MODULES = ("snowflake", "_snowflake")
+
+
+def procedure_source(name, sql_path=SQL_PATH):
+    """
+    Return the Python body of a procedure or function in the deploy script.
+    """
+    text = Path(sql_path).read_text()
+    header = re.search(
+        rf"CREATE OR REPLACE (?:PROCEDURE|FUNCTION) DS_DEV_DB\.DOC_AI_SCHEMA\.{re.escape(name)}\(",
+        text,
+        re.IGNORECASE,
+    )
+    if not header:
+        raise ValueError(f"No procedure or function named {name} in {sql_path}")
+    start = text.index("$$", header.end()) + 2
+    return text[start:text.index("$$", start)]
+
+
+def procedure_handler(name, sql_path=SQL_PATH):
+    """
+    Return the HANDLER function name of a procedure in the deploy script.
+    """
+    text = Path(sql_path).read_text()
+    header = re.search(
+        rf"CREATE OR REPLACE PROCEDURE DS_DEV_DB\.DOC_AI_SCHEMA\.{re.escape(name)}\((.*?)\$\$",
+        text,
+        re.IGNORECASE | re.DOTALL,
+    )
+    if not header:
+        raise ValueError(f"No procedure named {name} in {sql_path}")
+    return re.search(r"HANDLER\s*=\s*'(\w+)'", header.group(1)).group(1)
+
+
+def seed_rows(table, sql_path=SQL_PATH):
+    """
+    Return the rows the deploy script inserts into a table, as dicts.
+    """
+    rows = []
+    text = Path(sql_path).read_text()
+    for statement in re.finditer(
+        rf"INSERT INTO DS_DEV_DB\.DOC_AI_SCHEMA\.{re.escape(table)}\s*\(([^)]*)\)\s*VALUES(.*?);",
+        text,
+        re.IGNORECASE | re.DOTALL,
+    ):
+        columns = [column.strip() for column in statement.group(1).split(",")]
+        for values in re.findall(r"\((.*?)\)\s*[,;]?\s*(?=\(|$)", statement.group(2).strip(), re.DOTALL):
+            tokens = re.findall(r"'(?:[^']|'')*'|NULL|-?\d+(?:\.\d+)?", values)
+            rows.append({column: literal(token) for column, token in zip(columns, tokens)})
+    return rows
+
+
+def literal(token):
+    if token == "NULL":
+        return None
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    return float(token) if "." in token else int(token)
+
+
+def table_columns(table, sql_path=SQL_PATH):
+    """
+    Return the column names of a table created by the deploy script.
+    """
+    ddl = re.search(
+        rf"CREATE OR REPLACE TABLE (?:DS_DEV_DB\.DOC_AI_SCHEMA\.)?{re.escape(table)}\s*\((.*?)\n\);",
+        Path(sql_path).read_text(),
+        re.IGNORECASE | re.DOTALL,
+    )
+    if not ddl:
+        raise ValueError(f"No table named {table} in {sql_path}")
+    return [line.split()[0].upper() for line in ddl.group(1).splitlines() if line.strip()]
+
+
+def is_snowflake_import(node):
+    if isinstance(node, ast.ImportFrom):
+        return (node.module or "").startswith(SNOWFLAKE_MODULES)
+    return any(alias.name.startswith(SNOWFLAKE_MODULES) for alias in node.names)
+
+
+def load_definitions(name, *definitions, sql_path=SQL_PATH):
+    """
+    Execute the named functions and classes of a procedure body and return
+    them in a dict, e.g. load_definitions("HANDLE_PDF_FILES", "split_pdf").
+    """
+    tree = ast.parse(procedure_source(name, sql_path))
+    body = []
+    found = set()
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if not is_snowflake_import(node):
+                body.append(node)
+        elif isinstance(node, ast.Assign):
+            body.append(node)
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in definitions:
+            body.append(node)
+            found.add(node.name)
+
+    missing = set(definitions) - found
+    if missing:
+        raise ValueError(f"{name} does not define {', '.join(sorted(missing))}")
+
+    namespace = {"__name__": f"procedures.{name}"}
+    exec(compile(ast.Module(body=body, type_ignores=[]), f"<{name}>", "exec"), namespace)
+    return {definition: namespace[definition] for definition in definitions}
+
+
+def load_procedure(name, modules=None, sql_path=SQL_PATH):
+    """
+    Execute a whole procedure body and return its handler. Names bound by
+    Snowflake-only imports are set to None; they are only used in
+    annotations. MODULES maps module names to replacements seen by the
+    body's imports, e.g. {"time": simulated_clock}.
+    """
+    tree = ast.parse(procedure_source(name, sql_path))
+    namespace = {"__name__": f"procedures.{name}"}
+    body = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and is_snowflake_import(node):
+            for alias in node.names:
+                namespace[(alias.asname or alias.name).split(".")[0]] = None
+        else:
+            body.append(node)
+
+    saved = {module: sys.modules.get(module) for module in modules or {}}
+    sys.modules.update(modules or {})
+    try:
+        exec(compile(ast.Module(body=body, type_ignores=[]), f"<{name}>", "exec"), namespace)
+    finally:
+        for module, original in saved.items():
+            if original is None:
+                sys.modules.pop(module, None)
+            else:
+                sys.modules[module] = original
+    return namespace[procedure_handler(name, sql_path)]
@@ -0,0 +1,314 @@
+"""
+Evaluate the Snowflake expressions LOAD_MODEL_FLATTEN generates against
+parsed JSON documents, so tests can check the generated SQL itself rather
+than the stand-in's emulation of it.
+
+Only the subset build_flatten_sql emits is understood: column references,
+semi-structured paths (e.JSON:"field"[0]:score), casts, IFF, COALESCE,
+comparisons, AND / OR / NOT, IS [NOT] NULL, TRANSFORM / FILTER lambdas and
+the IS_*, ARRAY_* and OBJECT_CONSTRUCT functions. SQL NULL is None; a JSON
+null inside a document is JSON_NULL, which, as in Snowflake, is not NULL.
+"""
+import json
+import re
+
+TOKEN = re.compile(r"""\s*(?:
+    (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<op>::|->|[(),:\[\].<>=])
+  | (?P<name>[A-Za-z_$][A-Za-z0-9_$]*)
+)""", re.VERBOSE)
+
+KEYWORDS = {"AND", "OR", "NOT", "IS", "NULL", "AS", "TRUE", "FALSE"}
+
+
+class JsonNull:
+    def __repr__(self):
+        return "JSON_NULL"
+
+
+JSON_NULL = JsonNull()
+
+
+def tokenize(text):
+    tokens, position = [], 0
+    while text[position:].strip():
+        match = TOKEN.match(text, position)
+        if not match:
+            raise ValueError(f"Cannot read SQL at {text[position:position + 30]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name" and value.upper() in KEYWORDS:
+            kind, value = "keyword", value.upper()
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def variant(value):
+    return JSON_NULL if value is None else value
+
+
+def element(value, key):
+    if isinstance(key, int):
+        return variant(value[key]) if isinstance(value, list) and key < len(value) else None
+    return variant(value[key]) if isinstance(value, dict) and key in value else None
+
+
+def cast(value, type_name):
+    if value is None or value is JSON_NULL:
+        return None
+    if type_name == "FLOAT":
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"Failed to cast variant value {value!r} to FLOAT")
+        return float(value)
+    if type_name == "VARCHAR":
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, separators=(",", ":"))
+    if type_name == "ARRAY":
+        if not isinstance(value, list):
+            raise ValueError(f"Failed to cast variant value {value!r} to ARRAY")
+        return value
+    if type_name == "NUMBER":
+        return int(float(value))
+    raise ValueError(f"Unsupported cast to {type_name}")
+
+
+def try_to_double(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def compare(operator, left, right):
+    if left is None or right is None:
+        return None
+    return {"<": left < right, ">": left > right, "=": left == right}[operator]
+
+
+def logical_and(left, right):
+    if left is False or right is False:
+        return False
+    if left is None or right is None:
+        return None
+    return True
+
+
+def logical_or(left, right):
+    if left is True or right is True:
+        return True
+    if left is None or right is None:
+        return None
+    return False
+
+
+def array_to_string(values, separator):
+    if values is None:
+        return None
+    return separator.join("" if value is JSON_NULL else cast(value, "VARCHAR") for value in values)
+
+
+FUNCTIONS = {
+    "IS_OBJECT": lambda value: None if value is None else isinstance(value, dict),
+    "IS_ARRAY": lambda value: None if value is None else isinstance(value, list),
+    "AS_ARRAY": lambda value: value if isinstance(value, list) else None,
+    "ARRAY_SIZE": lambda value: len(value) if isinstance(value, list) else None,
+    "TRY_TO_DOUBLE": try_to_double,
+    "OBJECT_CONSTRUCT": lambda *pairs: {
+        pairs[i]: pairs[i + 1] for i in range(0, len(pairs), 2) if pairs[i + 1] is not None
+    },
+    "ARRAY_CONSTRUCT_COMPACT": lambda *values: [value for value in values if value is not None],
+    "ARRAY_TO_STRING": array_to_string,
+}
+
+
+class Parser:
+    """
+    Compile SQL text into functions of ROW, a dict of table alias -> column
+    values, e.g. {"e": {"RELATIVEPATH": ..., "JSON": document}}.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, token = self.peek()
+        if value is not None and token != value:
+            raise ValueError(f"Expected {value!r}, found {token!r}")
+        self.position += 1
+        return kind, token
+
+    def accept(self, value):
+        if self.peek()[1] == value:
+            self.position += 1
+            return True
+        return False
+
+    def expression(self):
+        left = self.conjunction()
+        while self.accept("OR"):
+            left = (lambda a, b: lambda row: logical_or(a(row), b(row)))(left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while self.accept("AND"):
+            left = (lambda a, b: lambda row: logical_and(a(row), b(row)))(left, self.negation())
+        return left
+
+    def negation(self):
+        if self.accept("NOT"):
+            inner = self.negation()
+            return lambda row: None if inner(row) is None else not inner(row)
+        return self.comparison()
+
+    def comparison(self):
+        left = self.postfix()
+        if self.peek()[1] in ("<", ">", "="):
+            operator = self.take()[1]
+            right = self.postfix()
+            return lambda row: compare(operator, left(row), right(row))
+        if self.accept("IS"):
+            negated = self.accept("NOT")
+            self.take("NULL")
+            return lambda row: (left(row) is None) != negated
+        return left
+
+    def postfix(self):
+        value = self.primary()
+        while True:
+            if self.accept("::"):
+                type_name = self.take()[1].upper()
+                value = (lambda inner, t: lambda row: cast(inner(row), t))(value, type_name)
+            elif self.accept(":"):
+                key = self.key()
+                value = (lambda inner, k: lambda row: element(inner(row), k))(value, key)
+            elif self.accept("["):
+                index = int(self.take()[1])
+                self.take("]")
+                value = (lambda inner, i: lambda row: element(inner(row), i))(value, index)
+            else:
+                return value
+
+    def key(self):
+        kind, token = self.take()
+        return token[1:-1].replace('""', '"') if kind == "quoted" else token
+
+    def primary(self):
+        kind, token = self.take()
+        if kind == "number":
+            number = float(token) if re.search(r"[.eE]", token) else int(token)
+            return lambda row: number
+        if kind == "string":
+            text = token[1:-1].replace("''", "'")
+            return lambda row: text
+        if kind == "keyword" and token in ("NULL", "TRUE", "FALSE"):
+            constant = {"NULL": None, "TRUE": True, "FALSE": False}[token]
+            return lambda row: constant
+        if token == "(":
+            inner = self.expression()
+            self.take(")")
+            return inner
+        if kind == "name" and self.peek()[1] == "(":
+            return self.call(token.upper())
+        if kind == "name" and self.accept("."):
+            column = self.take()[1].upper()
+            return lambda row: row[token][column]
+        if kind == "name":
+            return lambda row: row[token]
+        raise ValueError(f"Unexpected {token!r}")
+
+    def argument(self):
+        if self.peek()[0] == "name" and self.peek(1)[1] == "->":
+            name = self.take()[1]
+            self.take("->")
+            body = self.expression()
+            return lambda row: lambda value: body(dict(row, **{name: variant(value)}))
+        return self.expression()
+
+    def call(self, name):
+        self.take("(")
+        arguments = []
+        if not self.accept(")"):
+            arguments.append(self.argument())
+            while self.accept(","):
+                arguments.append(self.argument())
+            self.take(")")
+
+        if name == "IFF":
+            condition, then, otherwise = arguments
+            return lambda row: then(row) if condition(row) is True else otherwise(row)
+        if name == "COALESCE":
+            def coalesce(row):
+                for argument in arguments:
+                    value = argument(row)
+                    if value is not None:
+                        return value
+                return None
+            return coalesce
+        if name in ("TRANSFORM", "FILTER"):
+            values, function = arguments
+
+            def apply(row):
+                items, body = values(row), function(row)
+                if items is None:
+                    return None
+                if name == "TRANSFORM":
+                    return [body(item) for item in items]
+                return [item for item in items if body(item) is True]
+            return apply
+        if name not in FUNCTIONS:
+            raise ValueError(f"Unsupported function {name}")
+        function = FUNCTIONS[name]
+        return lambda row: function(*(argument(row) for argument in arguments))
+
+    def select_list(self):
+        """
+        Compile "expression [AS name], ..." into a function returning a dict
+        of output column -> value.
+        """
+        columns = []
+        while True:
+            expression = self.expression()
+            # Without AS, a column reference keeps the column's name
+            name = self.key() if self.accept("AS") else self.tokens[self.position - 1][1].upper()
+            columns.append((name, expression))
+            if not self.accept(","):
+                break
+        return lambda row: {name: expression(row) for name, expression in columns}
+
+
+def compile_predicate(text):
+    """
+    Compile a WHERE predicate; the result is True, False or None (NULL).
+    """
+    parser = Parser(text)
+    predicate = parser.expression()
+    if parser.peek()[0] is not None:
+        raise ValueError(f"Unread SQL after the predicate: {parser.peek()[1]!r}")
+    return predicate
+
+
+def compile_select(query):
+    """
+    Compile the select list of a "SELECT ... FROM" query; the FROM and WHERE
+    clauses are left to the caller.
+    """
+    select = re.search(r"\bSELECT\b(.*?)\bFROM\b", query, re.DOTALL | re.IGNORECASE)
+    if not select:
+        raise ValueError("No SELECT ... FROM in the query")
+    parser = Parser(select.group(1))
+    columns = parser.select_list()
+    if parser.peek()[0] is not None:
+        raise ValueError(f"Unread SQL in the select list: {parser.peek()[1]!r}")
+    return columns
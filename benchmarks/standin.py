@@ -0,0 +1,908 @@
+"""
+In-memory stand-in for the Snowpark session and the pipeline objects, for
+running the stored procedures in DOC_AI_QuickStart.SQL offline.
+
+Warehouse answers the statements the procedures issue, matched by pattern,
+with the effect they have in Snowflake: rows move through the prefilter,
+extraction, flatten and validated tables, streams collect changed rows, and
+stages hold file bytes. PREDICT is a Python callable. It is not a SQL
+engine: a statement it does not recognise raises StandInError, so a
+procedure change that adds a statement fails the benchmark until the
+stand-in learns it.
+
+StandInSession counts every round trip (statement, async query, stage file
+transfer or procedure call) and the time spent inside the stand-in, which
+the benchmarks subtract from the handler's wall time.
+"""
+import heapq
+import io
+import json
+import re
+import time
+from collections import Counter
+
+from procedures import seed_rows, table_columns
+
+SCHEMA = "DS_DEV_DB.DOC_AI_SCHEMA"
+
+
+class StandInError(Exception):
+    pass
+
+
+def file_bytes(value):
+    """
+    Contents of a stage file: bytes, or an object such as
+    synthetic.SyntheticFile that builds them on demand.
+    """
+    return value if isinstance(value, bytes) else value.data()
+
+
+class Row(dict):
+    """
+    A result row readable by column name, position, attribute or as_dict(),
+    like snowflake.snowpark.Row.
+    """
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.values())[key]
+        return super().__getitem__(key)
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def as_dict(self):
+        return dict(self)
+
+
+class AsyncJob:
+    """
+    Result of collect_nowait(). Done once the warehouse clock reaches
+    READY_AT; result() returns the rows or raises the statement's error.
+    """
+
+    def __init__(self, rows, error, ready_at, clock):
+        self.rows = rows
+        self.error = error
+        self.ready_at = ready_at
+        self.clock = clock
+
+    def is_done(self):
+        return self.clock() >= self.ready_at
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.rows
+
+
+class Query:
+
+    def __init__(self, session, query, params):
+        self.session = session
+        self.query = query
+        self.params = params or []
+
+    def collect(self):
+        return self.session.execute(self.query, self.params)
+
+    def collect_nowait(self):
+        return self.session.execute(self.query, self.params, asynchronous=True)
+
+
+class StageFiles:
+    """
+    session.file, reading and writing stage files in memory.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def get_stream(self, path, **kwargs):
+        stage, relative_path = split_stage_path(path)
+        self.session.count("GET")
+        try:
+            return io.BytesIO(file_bytes(self.session.warehouse.stages[stage][relative_path]))
+        except KeyError:
+            raise StandInError(f"File not found: {path}") from None
+
+    def put_stream(self, stream, path, **kwargs):
+        stage, relative_path = split_stage_path(path)
+        self.session.count("PUT")
+        self.session.warehouse.stages.setdefault(stage, {})[relative_path] = stream.read()
+
+
+def split_stage_path(path):
+    stage, _, relative_path = path.lstrip("@").partition("/")
+    return stage.upper(), relative_path
+
+
+class StandInSession:
+
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.file = StageFiles(self)
+        self.round_trips = 0
+        self.statements = Counter()
+        self.standin_seconds = 0.0
+
+    def count(self, kind):
+        self.round_trips += 1
+        self.statements[kind] += 1
+
+    def sql(self, query, params=None):
+        return Query(self, query, params)
+
+    def execute(self, query, params, asynchronous=False):
+        normalized = " ".join(query.split())
+        self.count(normalized.split(" ", 1)[0].upper() + (" ASYNC" if asynchronous else ""))
+        started = time.perf_counter()
+        try:
+            rows, error, delay = self.warehouse.execute(normalized, list(params), asynchronous)
+        finally:
+            self.standin_seconds += time.perf_counter() - started
+        if asynchronous:
+            clock = self.warehouse.clock
+            return AsyncJob([Row(row) for row in rows or []], error, clock() + delay, clock)
+        if error is not None:
+            raise error
+        return [Row(row) for row in rows]
+
+    def call(self, name, *args):
+        self.count("CALL")
+        return self.warehouse.procedures[name.split(".")[-1].upper()](self, *args)
+
+
+def flatten_param(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def cacheable(result):
+    # Mirrors the MERGE filter in ExtractionProcessor.update_cache
+    document = flatten_param(result)
+    return (
+        isinstance(document, dict)
+        and isinstance(document.get("__documentMetadata"), dict)
+        and document["__documentMetadata"].get("ocrScore") is not None
+        and "__error" not in document and "errors" not in document
+    )
+
+
+class Warehouse:
+    """
+    Tables, streams and stages of one pipeline deployment, seeded with the
+    MODEL_METADATA and SCORE_THRESHOLD rows of the deploy script.
+
+    PREDICT(model_name, relative_path, data) returns a result dict or
+    raises; PREDICT_DELAY(model_name, relative_path, data) gives the
+    seconds an asynchronous PREDICT takes on CLOCK. DATA is the stage file
+    as stored, bytes or a lazily built file. PROCEDURES maps names to
+    handlers for session.call(). TIMELINE records when each file first
+    reached each table, keyed by relative path.
+    """
+
+    def __init__(self, predict, clock=time.time, predict_delay=None, set_based_flatten=True):
+        self.predict = predict
+        self.predict_delay = predict_delay or (lambda model_name, path, data: 0.0)
+        self.clock = clock
+        self.set_based_flatten = set_based_flatten
+        self.procedures = {}
+
+        self.metadata = seed_rows("MODEL_METADATA")
+        self.thresholds = seed_rows("SCORE_THRESHOLD")
+        self.models = {row["MODEL_NAME"]: row for row in self.metadata}
+        self.columns = {}
+        for row in self.metadata:
+            for table in (row["FLATTEN_TABLE"], row["VALIDATED_TABLE"]):
+                self.columns[table.upper()] = table_columns(table)
+
+        self.stages = {"INVOICE_DOCS": {}, "MANUAL_REVIEW": {}, "IGNOIRED_DOCS": {}, "DOCAI_SPLIT_WORK": {}}
+        self.preprocess_stream = []
+        self.inbox = {}
+        self.prefilter = {}
+        self.prefilter_by_name = {}
+        self.next_rowid = 1
+        self.prefilter_stream = []
+        self.extract_queue = {}
+        self.extraction = {}
+        self.extraction_stream = []
+        self.flatten_queue = {}
+        self.flatten = {row["FLATTEN_TABLE"].upper(): [] for row in self.metadata}
+        self.flatten_streams = {table: [] for table in self.flatten}
+        self.validated = {row["VALIDATED_TABLE"].upper(): [] for row in self.metadata}
+        self.failed_history = {row["FAILED_SCORE_TABLE"].upper(): [] for row in self.metadata}
+        self.cache = {}
+        self.cache_stats = []
+        self.run_log = []
+        self.timeline = {}
+
+        self.handlers = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), handler) for pattern, handler in [
+            (r"^(BEGIN|COMMIT|ROLLBACK)$", self.transaction),
+            # COUNT_PDF_PAGES_PROC
+            (r"^INSERT INTO \S+\.STREAMDATA_TEMP .* FROM \S+\.PREPROCESS_STREAM", self.read_preprocess_stream),
+            (r"^SELECT RELATIVE_PATH, SIZE FROM \S+\.STREAMDATA_TEMP$", self.select_inbox),
+            (r"^DELETE FROM \S+\.STREAMDATA_TEMP ", self.delete_inbox),
+            (r"^MERGE INTO \S+\.DOCAI_PREFILTER ", self.merge_prefilter),
+            # MODEL_METADATA lookups
+            (r"^SELECT \* FROM \S+\.MODEL_METADATA$", self.select_metadata),
+            (r"^SELECT \* FROM \S+\.MODEL_METADATA WHERE MODEL_NAME = '(.*)'$", self.select_model_metadata),
+            (r"^SELECT MODEL_NAME FROM \S+\.MODEL_METADATA$", self.select_metadata),
+            (r"^SELECT MODEL_NAME, FLATTEN_TABLE, VALIDATED_TABLE FROM \S+\.MODEL_METADATA$", self.select_metadata),
+            # HANDLE_PDF_FILES and EXTRACT_CONTROLLER
+            (r"^INSERT INTO \S+\.DOCAI_EXTRACT_QUEUE .* FROM \S+\.PREFILTER_STREAM", self.read_prefilter_stream),
+            (r"^UPDATE \S+\.DOCAI_PREFILTER SET STATUS = 'ERROR', COMMENT = 'Error during processing: lease expired", self.expire_leases),
+            (r"^UPDATE \S+\.DOCAI_PREFILTER SET STATUS = 'IN PROGRESS'.* LIMIT (\d+) \)$", self.claim),
+            (r"^SELECT FILENAME, ROWID, FILESIZE, NUMBER_OF_PAGES, CONTENT_HASH, MODEL_NAME FROM \S+\.DOCAI_PREFILTER WHERE WORKER_ID = \?", self.select_claimed),
+            (r"^UPDATE \S+\.DOCAI_PREFILTER SET LEASE_EXPIRES_AT ", self.renew_lease),
+            (r"^UPDATE \S+\.DOCAI_PREFILTER SET STATUS = \?, COMMENT = \?(, PROCESS_END_TIME = CURRENT_TIMESTAMP)? WHERE ROWID IN", self.set_status),
+            (r"^UPDATE \S+\.DOCAI_PREFILTER p SET STATUS = s\.STATUS", self.write_outcomes),
+            (r"^DELETE FROM \S+\.DOCAI_EXTRACT_QUEUE q ", self.dequeue_extract),
+            (r"^COPY FILES INTO @(\w+) FROM @(\w+) FILES = \((.*)\)$", self.copy_files),
+            (r"^SELECT RELATIVE_PATH FROM DIRECTORY\(@(\w+)\) WHERE RELATIVE_PATH IN", self.select_directory),
+            (r"^INSERT INTO (?:\S+\.)?DOCAI_ORDERFORM_EXTRACTION .*\.(\w+)!PREDICT\(.* FROM DIRECTORY\(@(\w+)\)", self.insert_predictions),
+            (r"^UPDATE (?:\S+\.)?DOCAI_ORDERFORM_EXTRACTION SET PROCESS_END_TIME = CURRENT_TIMESTAMP", self.close_predictions),
+            (r"^SELECT \S+\.(\w+)!PREDICT\( GET_PRESIGNED_URL\(@(\w+), \?\), \d+ \)$", self.predict_one),
+            (r"^SELECT CONTENT_HASH FROM \S+\.DOCAI_EXTRACTION_CACHE WHERE", self.select_cache),
+            (r"^INSERT INTO (?:\S+\.)?DOCAI_ORDERFORM_EXTRACTION .* JOIN \( SELECT CONTENT_HASH, MODEL_NAME, JSON FROM \S+\.DOCAI_EXTRACTION_CACHE ", self.insert_from_cache),
+            (r"^INSERT INTO (?:\S+\.)?DOCAI_ORDERFORM_EXTRACTION .* FROM TABLE\(FLATTEN\(INPUT => PARSE_JSON\(\?\)\)\) f JOIN \S+\.DOCAI_PREFILTER p ON p\.ROWID = f\.value:ROWID", self.insert_results),
+            (r"^UPDATE \S+\.DOCAI_EXTRACTION_CACHE c SET HIT_COUNT", self.count_cache_hits),
+            (r"^MERGE INTO \S+\.DOCAI_EXTRACTION_CACHE c ", self.merge_cache),
+            (r"^DELETE FROM \S+\.DOCAI_EXTRACTION_CACHE c USING", self.evict_cache),
+            (r"^INSERT INTO \S+\.DOCAI_EXTRACTION_CACHE_STATS ", self.insert_cache_stats),
+            (r"^REMOVE @(\w+)/(.*)/$", self.remove_prefix),
+            (r"^INSERT INTO \S+\.DOCAI_PIPELINE_RUN_LOG .* VALUES \(CURRENT_TIMESTAMP, '(\w+)', NULL, \?, (\?|NULL), \?\)$", self.insert_run_log),
+            (r"^INSERT INTO \S+\.DOCAI_PIPELINE_RUN_LOG .* SELECT CURRENT_TIMESTAMP, '(\w+)'", self.insert_run_log_rows),
+            (r"^SELECT COUNT\(\*\) AS FILES, COALESCE\(SUM\(p\.NUMBER_OF_PAGES\), 0\) AS PAGES", self.select_backlog),
+            (r"^SELECT SUM\(ELAPSED_SECONDS\) AS SECONDS, SUM\(ROWS_PROCESSED\) AS FILES .* LIMIT (\d+) \)$", self.select_run_rate),
+            # LOAD_MODEL_FLATTEN
+            (r"^INSERT INTO \S+\.DOCAI_FLATTEN_QUEUE .* FROM \S+\.EXTRACTION_STREAM", self.read_extraction_stream),
+            (r"^SELECT COUNT\(\*\) AS COUNT FROM \S+\.DOCAI_FLATTEN_QUEUE WHERE MODEL_NAME = '(.*)';?$", self.count_flatten_queue),
+            (r"^SELECT SCORE_NAME, CAST\(SCORE_VALUE AS FLOAT\) AS SCORE_VALUE FROM \S+\.SCORE_THRESHOLD WHERE MODEL_NAME = '(.*)'$", self.select_thresholds),
+            (r"^DESCRIBE TABLE \S+\.(\w+)$", self.describe_table),
+            (r"^UPDATE \S+\.DOCAI_ORDERFORM_EXTRACTION e SET STATUS = 'FLATTENING'", self.mark_flattening),
+            (r"^SELECT COUNT\(\*\) AS TOTAL, COUNT_IF\(ARRAY_SIZE\(FAILURES\) > 0\) AS FAILED", self.count_flattening),
+            (r"^INSERT INTO \S+\.(\w+) \( RELATIVEPATH, MODEL_NAME, .* FROM \( SELECT", self.insert_flattened),
+            (r"^INSERT INTO \S+\.(\w+) \( SCORE_NAME, SCORE_VALUE, DATE_FAILED, FILENAME, COMMENTS \) SELECT f\.value:name", self.insert_flattened_failures),
+            (r"^UPDATE \S+\.DOCAI_ORDERFORM_EXTRACTION SET STATUS = 'PROCESSED' WHERE STATUS = 'FLATTENING'", self.finish_flattening),
+            (r"^SELECT RELATIVEPATH, JSON FROM \S+ e WHERE STATUS = 'NOT PROCESSED' AND MODEL_NAME = '(.*?)' AND", self.select_unflattened),
+            (r"^INSERT INTO \S+\.(\w+) \((.*?)\) VALUES \((.*)\)$", self.insert_flatten_row),
+            (r"^UPDATE \S+\.DOCAI_ORDERFORM_EXTRACTION SET STATUS = '(\w+)' WHERE RELATIVEPATH = '(.*)';?$", self.set_extraction_status),
+            (r"^UPDATE \S+\.DOCAI_ORDERFORM_EXTRACTION SET STATUS = 'ERROR', COMMENTS = .* WHERE RELATIVEPATH = '(.*)'$", self.mark_extraction_error),
+            (r"^INSERT INTO \S+\.(\w+) \(SCORE_NAME, SCORE_VALUE, DATE_FAILED, FILENAME, COMMENTS\) SELECT f\.value:SCORE_NAME", self.insert_failed_history),
+            (r"^DELETE FROM \S+\.DOCAI_FLATTEN_QUEUE q ", self.dequeue_flatten),
+            # LOAD_MODEL_VALIDATED
+            (r"^SELECT TABLE_NAME, COLUMN_NAME FROM DS_DEV_DB\.INFORMATION_SCHEMA\.COLUMNS", self.select_value_columns),
+            (r"^CREATE STREAM IF NOT EXISTS ", self.transaction),
+            (r"^SELECT SYSTEM\$STREAM_HAS_DATA\(\?\)$", self.stream_has_data),
+            (r"^INSERT INTO \S+\.(\w+) \( RELATIVEPATH, .* FROM \( SELECT \* FROM \S+\.(\w+)_STREAM ", self.insert_validated),
+            (r"^UPDATE \S+\.(\w+) f SET STATUS = 'VALIDATED'", self.mark_validated),
+        ]]
+
+    # -- dispatch
+
+    def execute(self, query, params, asynchronous=False):
+        """
+        Run a normalized statement. Returns (rows, error, delay); errors are
+        returned rather than raised so asynchronous jobs can report them.
+        """
+        for pattern, handler in self.handlers:
+            match = pattern.search(query)
+            if match:
+                try:
+                    rows, delay = handler(match, params), 0.0
+                    if isinstance(rows, tuple):
+                        rows, delay = rows
+                    return rows, None, delay
+                except StandInError as e:
+                    return None, e, 0.0
+        raise StandInError(f"The stand-in does not handle: {query[:300]}")
+
+    def transaction(self, match, params):
+        # Transactions are not modelled; every statement applies at once
+        return []
+
+    def reached(self, relative_path, event):
+        self.timeline.setdefault(relative_path, {}).setdefault(event, self.clock())
+
+    # -- loading
+
+    def add_files(self, files):
+        """
+        Land (relative_path, bytes) pairs on @INVOICE_DOCS and its stream.
+        """
+        stage = self.stages["INVOICE_DOCS"]
+        for relative_path, data in files:
+            stage[relative_path] = data
+            self.reached(relative_path, "landed")
+            self.preprocess_stream.append({"RELATIVE_PATH": relative_path, "SIZE": len(data)})
+
+    def admit(self, rows):
+        """
+        Insert prefilter rows as COUNT_PDF_PAGES_PROC would, for stages that
+        start after preprocessing.
+        """
+        for row in rows:
+            self.upsert_prefilter(row)
+
+    # -- COUNT_PDF_PAGES_PROC
+
+    def read_preprocess_stream(self, match, params):
+        for row in self.preprocess_stream:
+            self.inbox[row["RELATIVE_PATH"]] = row["SIZE"]
+        inserted = len(self.preprocess_stream)
+        self.preprocess_stream = []
+        return [{"number of rows inserted": inserted}]
+
+    def select_inbox(self, match, params):
+        return [{"RELATIVE_PATH": path, "SIZE": size} for path, size in self.inbox.items()]
+
+    def delete_inbox(self, match, params):
+        paths = flatten_param(params[0])
+        for path in paths:
+            self.inbox.pop(path, None)
+        return [{"number of rows deleted": len(paths)}]
+
+    def upsert_prefilter(self, source):
+        row = self.prefilter_by_name.get(source["FILENAME"])
+        if row is None:
+            row = {"ROWID": self.next_rowid, "DATECREATED": self.clock(), "CLAIM_ATTEMPTS": None}
+            self.next_rowid += 1
+            self.prefilter[row["ROWID"]] = row
+            self.prefilter_by_name[source["FILENAME"]] = row
+            self.reached(source["FILENAME"], "preprocessed")
+        else:
+            row["CLAIM_ATTEMPTS"] = 0
+        row.update({key: source.get(key) for key in (
+            "MODEL_NAME", "FILENAME", "FILESIZE", "NUMBER_OF_PAGES", "COMMENT", "STATUS",
+            "PROCESS_START_TIME", "PROCESS_END_TIME", "CONTENT_HASH",
+        )})
+        row["WORKER_ID"] = None
+        row["LEASE_EXPIRES_AT"] = None
+        self.changed_prefilter(row)
+
+    def merge_prefilter(self, match, params):
+        rows = flatten_param(params[0])
+        for source in rows:
+            self.upsert_prefilter(source)
+        return [{"number of rows inserted": len(rows)}]
+
+    def changed_prefilter(self, row):
+        self.prefilter_stream.append((row["ROWID"], row["STATUS"]))
+
+    # -- MODEL_METADATA
+
+    def select_metadata(self, match, params):
+        return [dict(row) for row in self.metadata]
+
+    def select_model_metadata(self, match, params):
+        return [dict(row) for row in self.metadata if row["MODEL_NAME"] == match.group(1).replace("''", "'")]
+
+    # -- HANDLE_PDF_FILES
+
+    def read_prefilter_stream(self, match, params):
+        now = self.clock()
+        for rowid, status in self.prefilter_stream:
+            if status == "NOT PROCESSED":
+                self.extract_queue.setdefault(rowid, now)
+        self.prefilter_stream = []
+        return []
+
+    def claimable(self, row, now):
+        if row["STATUS"] == "NOT PROCESSED":
+            return True
+        return row["STATUS"] == "IN PROGRESS" and (row["LEASE_EXPIRES_AT"] or 0) < now
+
+    def holds_lease(self, row, lease_id):
+        return row["WORKER_ID"] == lease_id and (row["LEASE_EXPIRES_AT"] or 0) > self.clock()
+
+    def expire_leases(self, match, params):
+        now = self.clock()
+        expired = 0
+        for rowid in self.extract_queue:
+            row = self.prefilter[rowid]
+            if (row["STATUS"] == "IN PROGRESS" and (row["LEASE_EXPIRES_AT"] or 0) < now
+                    and (row["CLAIM_ATTEMPTS"] or 0) >= params[0]):
+                row.update(STATUS="ERROR", LEASE_EXPIRES_AT=None, PROCESS_END_TIME=now,
+                           COMMENT=f"Error during processing: lease expired {params[0]} times.")
+                self.changed_prefilter(row)
+                expired += 1
+        return [{"number of rows updated": expired}]
+
+    def claim(self, match, params):
+        """
+        The claim UPDATE: per model, rank files by schedule policy, keep
+        those within the run budgets, and take LIMIT rows by rank.
+        """
+        lease_id, minutes, used = params[0], params[1], flatten_param(params[2])
+        limit = int(match.group(1))
+        now = self.clock()
+
+        by_model = {}
+        for rowid in self.extract_queue:
+            row = self.prefilter[rowid]
+            if self.claimable(row, now):
+                by_model.setdefault(row["MODEL_NAME"], []).append(row)
+
+        candidates = []
+        for model_name, rows in by_model.items():
+            metadata = self.models.get(model_name, {})
+            if (metadata.get("SCHEDULE_POLICY") or "FIFO").upper() == "SJF":
+                aging = metadata.get("AGING_MINUTES") or 0
+
+                def priority(row):
+                    waited = int((now - row["DATECREATED"]) // 60) / aging if aging else 0
+                    return ((row["NUMBER_OF_PAGES"] or 0) - waited, row["ROWID"])
+            else:
+                def priority(row):
+                    return (0, row["ROWID"])
+
+            spent = used.get(model_name, {})
+            run_pages, run_bytes = spent.get("PAGES", 0), spent.get("BYTES", 0)
+            first_claim = run_pages + run_bytes == 0
+            for rank, row in enumerate(heapq.nsmallest(limit, rows, key=priority), start=1):
+                run_pages += row["NUMBER_OF_PAGES"] or 0
+                run_bytes += int(row["FILESIZE"] or 0)
+                within = ((metadata.get("RUN_PAGE_BUDGET") is None or run_pages <= metadata["RUN_PAGE_BUDGET"])
+                          and (metadata.get("RUN_BYTE_BUDGET") is None or run_bytes <= metadata["RUN_BYTE_BUDGET"]))
+                if (first_claim and rank == 1) or within:
+                    candidates.append((rank, row["ROWID"], row))
+
+        claimed = 0
+        for _, _, row in sorted(candidates, key=lambda entry: entry[:2])[:limit]:
+            row.update(STATUS="IN PROGRESS", COMMENT="Processing in progress.", WORKER_ID=lease_id,
+                       LEASE_EXPIRES_AT=now + minutes * 60, CLAIM_ATTEMPTS=(row["CLAIM_ATTEMPTS"] or 0) + 1)
+            self.changed_prefilter(row)
+            claimed += 1
+        return [{"number of rows updated": claimed}]
+
+    def select_claimed(self, match, params):
+        return [
+            {key: row[key] for key in ("FILENAME", "ROWID", "FILESIZE", "NUMBER_OF_PAGES", "CONTENT_HASH", "MODEL_NAME")}
+            for rowid in self.extract_queue
+            for row in (self.prefilter[rowid],)
+            if row["WORKER_ID"] == params[0] and row["STATUS"] == "IN PROGRESS"
+        ]
+
+    def renew_lease(self, match, params):
+        for rowid in self.extract_queue:
+            row = self.prefilter[rowid]
+            if row["WORKER_ID"] == params[1] and row["STATUS"] == "IN PROGRESS":
+                row["LEASE_EXPIRES_AT"] = self.clock() + params[0] * 60
+        return []
+
+    def set_status(self, match, params):
+        status, comment, rowids, lease_id = params[0], params[1], flatten_param(params[2]), params[3]
+        updated = 0
+        for rowid in rowids:
+            row = self.prefilter.get(rowid)
+            if row is not None and self.holds_lease(row, lease_id):
+                row.update(STATUS=status, COMMENT=comment)
+                if match.group(1):
+                    row["PROCESS_END_TIME"] = self.clock()
+                self.changed_prefilter(row)
+                updated += 1
+        return [{"number of rows updated": updated}]
+
+    def write_outcomes(self, match, params):
+        for outcome in flatten_param(params[0]):
+            row = self.prefilter.get(outcome["ROWID"])
+            if row is not None and self.holds_lease(row, params[1]):
+                row.update(STATUS=outcome["STATUS"], COMMENT=outcome["COMMENT"])
+                self.changed_prefilter(row)
+        return []
+
+    def dequeue_extract(self, match, params):
+        finished = [
+            rowid for rowid in self.extract_queue
+            if self.prefilter[rowid]["STATUS"] not in ("NOT PROCESSED", "IN PROGRESS")
+        ]
+        for rowid in finished:
+            del self.extract_queue[rowid]
+        return [{"number of rows deleted": len(finished)}]
+
+    def copy_files(self, match, params):
+        target, source = self.stages.setdefault(match.group(1).upper(), {}), self.stages[match.group(2).upper()]
+        copied = []
+        for name in re.findall(r"'((?:[^']|'')*)'", match.group(3)):
+            name = name.replace("''", "'")
+            if name in source:
+                target[name] = source[name]
+                copied.append({"file": name})
+        return copied
+
+    def select_directory(self, match, params):
+        stage = self.stages[match.group(1).upper()]
+        return [{"RELATIVE_PATH": path} for path in flatten_param(params[0]) if path in stage]
+
+    def add_extraction(self, row):
+        self.extraction[row["RELATIVEPATH"]] = row
+        self.reached(row["RELATIVEPATH"], "extracted")
+        self.changed_extraction(row)
+
+    def changed_extraction(self, row):
+        self.extraction_stream.append((row["RELATIVEPATH"], row["MODEL_NAME"], row["STATUS"]))
+
+    def run_predict(self, model_name, stage, path):
+        data = self.stages[stage].get(path)
+        if data is None:
+            raise StandInError(f"Remote file '{path}' was not found.")
+        try:
+            return self.predict(model_name, path, data), self.predict_delay(model_name, path, data)
+        except Exception as e:
+            raise StandInError(f"Document AI error for {path}: {e}") from None
+
+    def insert_predictions(self, match, params):
+        """
+        Bulk PREDICT: one failing document fails the whole statement.
+        """
+        model_name, stage = match.group(1), match.group(2).upper()
+        rows, delay = [], 0.0
+        for rowid in flatten_param(params[2]):
+            prefilter = self.prefilter[rowid]
+            if not self.holds_lease(prefilter, params[3]) or prefilter["FILENAME"] not in self.stages[stage]:
+                continue
+            result, seconds = self.run_predict(model_name, stage, prefilter["FILENAME"])
+            delay += seconds
+            rows.append({
+                "RELATIVEPATH": prefilter["FILENAME"], "MODEL_NAME": params[0],
+                "SIZE": len(self.stages[stage][prefilter["FILENAME"]]), "JSON": json.dumps(result),
+                "COMMENTS": "File processed successfully.", "STATUS": "NOT PROCESSED",
+                "PROCESS_START_TIME": params[1], "PROCESS_END_TIME": None,
+            })
+        for row in rows:
+            self.add_extraction(row)
+        return [{"number of rows inserted": len(rows)}], delay
+
+    def close_predictions(self, match, params):
+        for rowid in flatten_param(params[0]):
+            row = self.extraction.get(self.prefilter[rowid]["FILENAME"])
+            if row is not None and row["PROCESS_END_TIME"] is None:
+                row["PROCESS_END_TIME"] = self.clock()
+        return []
+
+    def predict_one(self, match, params):
+        result, delay = self.run_predict(match.group(1), match.group(2).upper(), params[0])
+        return [{"PREDICT": json.dumps(result)}], delay
+
+    def insert_results(self, match, params):
+        inserted = 0
+        for result in flatten_param(params[2]):
+            if not self.holds_lease(self.prefilter[result["ROWID"]], params[3]):
+                continue
+            self.add_extraction({
+                "RELATIVEPATH": result["RELATIVEPATH"], "MODEL_NAME": params[0], "SIZE": result["SIZE"],
+                "JSON": json.dumps(result["JSON"]), "COMMENTS": params[1], "STATUS": "NOT PROCESSED",
+                "PROCESS_START_TIME": result["PROCESS_START_TIME"], "PROCESS_END_TIME": result["PROCESS_END_TIME"],
+            })
+            inserted += 1
+        return [{"number of rows inserted": inserted}]
+
+    def remove_prefix(self, match, params):
+        stage = self.stages.get(match.group(1).upper(), {})
+        prefix = match.group(2) + "/"
+        removed = [path for path in stage if path.startswith(prefix)]
+        for path in removed:
+            del stage[path]
+        return [{"name": path, "result": "removed"} for path in removed]
+
+    # -- extraction cache
+
+    def select_cache(self, match, params):
+        model_name, version, hashes = params[0], params[1], flatten_param(params[2])
+        return [{"CONTENT_HASH": h} for h in hashes if (h, model_name, version) in self.cache]
+
+    def insert_from_cache(self, match, params):
+        model_name, version, rowids, lease_id = params[0], params[1], flatten_param(params[2]), params[3]
+        inserted = 0
+        for rowid in rowids:
+            row = self.prefilter[rowid]
+            entry = self.cache.get((row["CONTENT_HASH"], model_name, version))
+            if entry is not None and self.holds_lease(row, lease_id):
+                now = self.clock()
+                self.add_extraction({
+                    "RELATIVEPATH": row["FILENAME"], "MODEL_NAME": model_name, "SIZE": int(row["FILESIZE"]),
+                    "JSON": entry["JSON"], "COMMENTS": "File served from the extraction cache.",
+                    "STATUS": "NOT PROCESSED", "PROCESS_START_TIME": now, "PROCESS_END_TIME": now,
+                })
+                inserted += 1
+        return [{"number of rows inserted": inserted}]
+
+    def count_cache_hits(self, match, params):
+        for content_hash, hits in flatten_param(params[0]).items():
+            entry = self.cache.get((content_hash, params[1], params[2]))
+            if entry is not None:
+                entry["HIT_COUNT"] += hits
+                entry["LAST_HIT_AT"] = self.clock()
+        return []
+
+    def merge_cache(self, match, params):
+        model_name, rowids, version = params[0], flatten_param(params[1]), params[3]
+        for rowid in rowids:
+            row = self.prefilter[rowid]
+            extraction = self.extraction.get(row["FILENAME"])
+            key = (row["CONTENT_HASH"], model_name, version)
+            if row["STATUS"] == "PROCESSED" and extraction is not None and key not in self.cache \
+                    and cacheable(extraction["JSON"]):
+                self.cache[key] = {"JSON": extraction["JSON"], "CREATED_AT": self.clock(), "LAST_HIT_AT": None, "HIT_COUNT": 0}
+        return []
+
+    def evict_cache(self, match, params):
+        # Synthetic corpora stay far below CACHE_MAX_ENTRIES and the age limit
+        return [{"number of rows deleted": 0}]
+
+    def insert_cache_stats(self, match, params):
+        self.cache_stats.append(dict(zip(("MODEL_NAME", "HITS", "MISSES", "EVICTED"), params)))
+        return []
+
+    # -- DOCAI_PIPELINE_RUN_LOG and EXTRACT_CONTROLLER
+
+    def insert_run_log(self, match, params):
+        values = list(params)
+        if match.group(2) == "NULL":
+            values.insert(1, None)
+        self.run_log.append({
+            "RUN_TIME": self.clock(), "PROCEDURE_NAME": match.group(1), "MODEL_NAME": None,
+            "ROWS_PROCESSED": values[0], "ELAPSED_SECONDS": values[1], "COMMENTS": values[2],
+        })
+        return []
+
+    def insert_run_log_rows(self, match, params):
+        for row in flatten_param(params[0]):
+            self.run_log.append(dict(row, RUN_TIME=self.clock(), PROCEDURE_NAME=match.group(1)))
+        return []
+
+    def select_backlog(self, match, params):
+        now = self.clock()
+        waiting = [
+            self.prefilter[rowid] for rowid in self.extract_queue
+            if self.claimable(self.prefilter[rowid], now)
+        ]
+        return [{"FILES": len(waiting), "PAGES": sum(row["NUMBER_OF_PAGES"] or 0 for row in waiting)}]
+
+    def select_run_rate(self, match, params):
+        runs = [
+            row for row in self.run_log
+            if row["PROCEDURE_NAME"] == "HANDLE_PDF_FILES" and (row["ROWS_PROCESSED"] or 0) > 0
+        ][-int(match.group(1)):]
+        if not runs:
+            return [{"SECONDS": None, "FILES": None}]
+        return [{"SECONDS": sum(row["ELAPSED_SECONDS"] for row in runs), "FILES": sum(row["ROWS_PROCESSED"] for row in runs)}]
+
+    # -- LOAD_MODEL_FLATTEN
+
+    def read_extraction_stream(self, match, params):
+        now = self.clock()
+        for path, model_name, status in self.extraction_stream:
+            if status == "NOT PROCESSED":
+                self.flatten_queue.setdefault((path, model_name), now)
+        self.extraction_stream = []
+        return []
+
+    def count_flatten_queue(self, match, params):
+        model_name = match.group(1).replace("''", "'")
+        return [{"COUNT": sum(1 for _, model in self.flatten_queue if model == model_name)}]
+
+    def select_thresholds(self, match, params):
+        model_name = match.group(1).replace("''", "'")
+        return [
+            {"SCORE_NAME": row["SCORE_NAME"], "SCORE_VALUE": float(row["SCORE_VALUE"])}
+            for row in self.thresholds if row["MODEL_NAME"] == model_name
+        ]
+
+    def describe_table(self, match, params):
+        return [{"name": column} for column in self.columns[match.group(1).upper()]]
+
+    def model_thresholds(self, model_name):
+        return {row["SCORE_NAME"]: float(row["SCORE_VALUE"]) for row in self.thresholds if row["MODEL_NAME"] == model_name}
+
+    def queued_extractions(self, model_name, status):
+        for path, model in self.flatten_queue:
+            row = self.extraction.get(path)
+            if model == model_name and row is not None and row["MODEL_NAME"] == model_name and row["STATUS"] == status:
+                yield row
+
+    @staticmethod
+    def well_formed(document, thresholds):
+        """
+        The predicate build_flatten_sql generates, evaluated in Python.
+        """
+        if not isinstance(document, dict):
+            return False
+
+        def number(value):
+            # TRY_TO_DOUBLE(value::VARCHAR)
+            if isinstance(value, bool) or value is None:
+                return False
+            try:
+                float(value)
+                return True
+            except (TypeError, ValueError):
+                return False
+
+        metadata = document.get("__documentMetadata", {})
+        if not isinstance(metadata, dict):
+            return False
+        if "ocrScore" in metadata and not number(metadata["ocrScore"]):
+            return False
+        for field in thresholds:
+            if field == "ocrScore" or field not in document:
+                continue
+            values = document[field]
+            if not isinstance(values, list) or not all(isinstance(item, dict) for item in values):
+                return False
+            if values and "score" in values[0] and not number(values[0]["score"]):
+                return False
+        return True
+
+    def flatten_rows(self, model_name):
+        """
+        Rows the set-based scoring query returns for the model's FLATTENING
+        records: column values plus the list of failures.
+        """
+        thresholds = self.model_thresholds(model_name)
+        table = self.models[model_name]["FLATTEN_TABLE"].upper()
+        columns = set(self.columns[table])
+        for row in self.queued_extractions(model_name, "FLATTENING"):
+            document = json.loads(row["JSON"])
+            ocr = float((document.get("__documentMetadata") or {}).get("ocrScore") or 0)
+            values = {"RELATIVEPATH": row["RELATIVEPATH"], "OCR_SCORE": ocr}
+            failures = []
+            if "ocrScore" in thresholds and ocr < thresholds["ocrScore"]:
+                failures.append({"name": "OCR_Score", "score": ocr})
+            for field, threshold in thresholds.items():
+                if field == "ocrScore":
+                    continue
+                items = document.get(field) or []
+                score = float(items[0].get("score") or 0) if items else 0
+                if items and score < threshold:
+                    failures.append({"name": field, "score": score})
+                if f"{field.upper()}_SCORE" in columns and f"{field.upper()}_VALUE" in columns:
+                    values[f"{field.upper()}_SCORE"] = score
+                    values[f"{field.upper()}_VALUE"] = (
+                        ", ".join(item.get("value") or "" for item in items) if items else "NULL"
+                    )
+            yield values, failures
+
+    def mark_flattening(self, match, params):
+        if not self.set_based_flatten:
+            raise_error = StandInError("SQL compilation error: set-based flatten disabled in the stand-in")
+            raise raise_error
+        model_name = params[0]
+        thresholds = self.model_thresholds(model_name)
+        marked = 0
+        for row in list(self.queued_extractions(model_name, "NOT PROCESSED")):
+            try:
+                document = json.loads(row["JSON"])
+            except ValueError:
+                continue
+            if self.well_formed(document, thresholds):
+                row["STATUS"] = "FLATTENING"
+                self.changed_extraction(row)
+                marked += 1
+        return [{"number of rows updated": marked}]
+
+    def count_flattening(self, match, params):
+        scored = list(self.flatten_rows(params[0]))
+        return [{"TOTAL": len(scored), "FAILED": sum(1 for _, failures in scored if failures)}]
+
+    def add_flatten_row(self, table, row):
+        self.flatten[table].append(row)
+        self.flatten_streams[table].append(row)
+        self.reached(row["RELATIVEPATH"], "flattened")
+
+    def insert_flattened(self, match, params):
+        table = match.group(1).upper()
+        now = self.clock()
+        for values, failures in self.flatten_rows(params[1]):
+            self.add_flatten_row(table, dict(
+                values, MODEL_NAME=params[0],
+                STATUS="FAILED" if failures else "PROCESSED",
+                COMMENTS=("Failed: " + ", ".join(f["name"] for f in failures)) if failures else "All scores passed",
+                PROCESSED_TIMESTAMP=now, PROCESS_START_TIME=now, PROCESS_END_TIME=now,
+            ))
+        return []
+
+    def insert_flattened_failures(self, match, params):
+        history = self.failed_history[match.group(1).upper()]
+        for values, failures in self.flatten_rows(params[0]):
+            for failure in failures:
+                history.append({
+                    "SCORE_NAME": failure["name"], "SCORE_VALUE": failure["score"], "DATE_FAILED": self.clock(),
+                    "FILENAME": values["RELATIVEPATH"], "COMMENTS": f"{failure['name']} failed validation",
+                })
+        return []
+
+    def finish_flattening(self, match, params):
+        for row in list(self.queued_extractions(params[0], "FLATTENING")):
+            row["STATUS"] = "PROCESSED"
+            self.changed_extraction(row)
+        return []
+
+    def select_unflattened(self, match, params):
+        model_name = match.group(1).replace("''", "'")
+        return [{"RELATIVEPATH": row["RELATIVEPATH"], "JSON": row["JSON"]} for row in self.queued_extractions(model_name, "NOT PROCESSED")]
+
+    def insert_flatten_row(self, match, params):
+        table = match.group(1).upper()
+        if table not in self.flatten:
+            raise StandInError(f"Table '{table}' does not exist")
+        columns = [column.strip() for column in match.group(2).split(",")]
+        values = iter(params)
+        row = {
+            column: (self.clock() if placeholder.strip() == "CURRENT_TIMESTAMP()" else next(values))
+            for column, placeholder in zip(columns, match.group(3).split(", "))
+        }
+        self.add_flatten_row(table, row)
+        return []
+
+    def set_extraction_status(self, match, params):
+        row = self.extraction.get(match.group(2).replace("''", "'"))
+        if row is not None:
+            row["STATUS"] = match.group(1)
+            self.changed_extraction(row)
+        return []
+
+    def mark_extraction_error(self, match, params):
+        row = self.extraction.get(match.group(1).replace("''", "'"))
+        if row is not None:
+            row["STATUS"] = "ERROR"
+            self.changed_extraction(row)
+        return []
+
+    def insert_failed_history(self, match, params):
+        self.failed_history[match.group(1).upper()].extend(flatten_param(params[0]))
+        return []
+
+    def dequeue_flatten(self, match, params):
+        finished = [
+            key for key in self.flatten_queue
+            if key[1] == params[0] and (self.extraction.get(key[0]) or {}).get("STATUS") != "NOT PROCESSED"
+        ]
+        for key in finished:
+            del self.flatten_queue[key]
+        return [{"number of rows deleted": len(finished)}]
+
+    # -- LOAD_MODEL_VALIDATED
+
+    def select_value_columns(self, match, params):
+        return [
+            {"TABLE_NAME": table, "COLUMN_NAME": column}
+            for table in self.flatten for column in self.columns[table] if column.endswith("_VALUE")
+        ]
+
+    def stream_has_data(self, match, params):
+        table = params[0].split(".")[-1].upper()
+        if table.endswith("_STREAM"):
+            table = table[:-len("_STREAM")]
+        return [{"HAS_DATA": bool(self.flatten_streams.get(table))}]
+
+    def validated_arrivals(self, table):
+        return [row for row in self.flatten_streams[table] if row["STATUS"] == "PROCESSED"]
+
+    def insert_validated(self, match, params):
+        target, table = self.validated[match.group(1).upper()], match.group(2).upper()
+        value_columns = [column for column in self.columns[table] if column.endswith("_VALUE")]
+        arrivals = self.validated_arrivals(table)
+        for row in arrivals:
+            target.append(dict(
+                {column: (row.get(column) or "NULL") for column in value_columns},
+                RELATIVEPATH=row["RELATIVEPATH"], PROCESS_START_TIME=params[0], PROCESS_END_TIME=self.clock(),
+            ))
+            self.reached(row["RELATIVEPATH"], "validated")
+        return [{"number of rows inserted": len(arrivals)}]
+
+    def mark_validated(self, match, params):
+        table = match.group(1).upper()
+        arrivals = {row["RELATIVEPATH"] for row in self.validated_arrivals(table)}
+        # The stream is consumed by the transaction; the status change itself
+        # is recorded as the next change
+        self.flatten_streams[table] = []
+        for row in self.flatten[table]:
+            if row["RELATIVEPATH"] in arrivals and row["STATUS"] == "PROCESSED":
+                row["STATUS"] = "VALIDATED"
+                self.flatten_streams[table].append(row)
+        return []
@@ -0,0 +1,131 @@
+"""
+Synthetic documents and Document AI results for the benchmarks.
+
+pdf_bytes writes small but valid PDFs by hand, so corpora of 100k files
+are cheap to build; every file gets a distinct id and therefore a distinct
+content hash. prediction builds a PREDICT-shaped result for a model's
+score fields.
+"""
+import random
+
+PAGE = (
+    b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+    b"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> >> "
+    b"/Contents %d 0 R >>"
+)
+
+
+def pdf_bytes(pages, padding=0, document_id=""):
+    """
+    Build a PDF with PAGES pages. PADDING bytes of comment text are added to
+    the first page's content stream to reach a target file size.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages)).encode()
+    objects.append(b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages)
+    for i in range(pages):
+        content = b"BT /F1 12 Tf 72 720 Td (%s page %d) Tj ET\n" % (document_id.encode(), i + 1)
+        if i == 0 and padding:
+            content += b"%" + b"x" * max(padding - 1, 0) + b"\n"
+        objects.append(PAGE % (4 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def corrupt_bytes(rng, size=2048):
+    """
+    Bytes that look like the start of a PDF but cannot be parsed.
+    """
+    return b"%PDF-1.4\n" + rng.randbytes(size)
+
+
+def damaged_bytes(pages, padding=0, document_id=""):
+    """
+    A PDF whose page tree claims PAGES pages but whose page objects are
+    missing: the trailer-based page count reads it, a full parser cannot.
+    PADDING bytes of comment follow the page tree.
+    """
+    data = pdf_bytes(pages, document_id=document_id)
+    filler = b"%" + b"x" * max(padding - 1, 0) + b"\n" if padding else b""
+    return data[:data.index(b"3 0 obj")] + filler + b"trailer\n<< /Size 3 /Root 1 0 R >>\n%%EOF\n"
+
+
+class SyntheticFile:
+    """
+    A stage file built on every read instead of held in memory. KIND is
+    "pdf", "damaged", "corrupt" or "empty".
+    """
+
+    def __init__(self, kind, pages=1, padding=0, document_id=""):
+        self.kind = kind
+        self.pages = pages
+        self.padding = padding
+        self.document_id = document_id
+        self.size = None
+
+    def data(self):
+        if self.kind == "pdf":
+            return pdf_bytes(self.pages, self.padding, self.document_id)
+        if self.kind == "damaged":
+            return damaged_bytes(self.pages, self.padding, self.document_id)
+        if self.kind == "corrupt":
+            return corrupt_bytes(seeded_rng("corrupt", self.document_id), self.padding or 2048)
+        return b""
+
+    def __len__(self):
+        if self.size is None:
+            self.size = len(self.data())
+        return self.size
+
+
+def prediction(thresholds, rng, low_score_rate=0.02, missing_rate=0.05, ocr_range=(0.97, 1.0)):
+    """
+    A PREDICT result for the fields of THRESHOLDS ({field: threshold}):
+    scores at or above each field's threshold except for LOW_SCORE_RATE of
+    values below it, some absent or empty fields and a few multi-value line
+    items.
+    """
+    result = {"__documentMetadata": {"ocrScore": round(rng.uniform(*ocr_range), 3)}}
+    for field, threshold in thresholds.items():
+        roll = rng.random()
+        if roll < missing_rate:
+            continue
+        if roll < missing_rate * 2:
+            result[field] = []
+            continue
+        result[field] = [
+            {
+                "score": (
+                    round(rng.uniform(0.2, threshold), 3) * 0.999 if rng.random() < low_score_rate
+                    else max(threshold, round(rng.uniform(threshold, 1.0), 3))
+                ),
+                "value": f"{field.lower()}-{rng.randint(1, 99999)}",
+            }
+            for _ in range(rng.choice((1, 1, 1, 2, 3)))
+        ]
+    return result
+
+
+def model_thresholds(thresholds, model_name):
+    """
+    {field: threshold} of a model from SCORE_THRESHOLD rows, without
+    ocrScore.
+    """
+    return {
+        row["SCORE_NAME"]: float(row["SCORE_VALUE"]) for row in thresholds
+        if row["MODEL_NAME"] == model_name and row["SCORE_NAME"] != "ocrScore"
+    }
+
+
+def seeded_rng(*parts):
+    return random.Random(":".join(str(part) for part in parts))
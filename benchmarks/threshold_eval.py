@@ -0,0 +1,122 @@
+"""
+Micro-benchmark of score threshold evaluation in LOAD_MODEL_FLATTEN and
+the SCORE_FAILURES UDF.
+
+Compares the record-by-record loop the procedure used to run with the
+vectorized score_matrix / evaluate_thresholds pair it runs now, on synthetic
+Document AI results scored against the INVOICE_MODEL thresholds from the
+deploy script. Both must produce the same failed fields.
+
+    python benchmarks/threshold_eval.py
+    python benchmarks/threshold_eval.py --records 10000 100000 --seed 7
+"""
+import argparse
+import random
+import re
+import time
+
+from procedures import SQL_PATH
+from docai_common import evaluate_thresholds, score_matrix
+
+MODEL_NAME = "INVOICE_MODEL"
+
+
+def seeded_thresholds(model_name=MODEL_NAME):
+    """
+    Read a model's SCORE_THRESHOLD seed rows from the deploy script.
+    """
+    rows = re.findall(
+        rf"\('{model_name}',\s*'([^']+)',\s*([0-9.]+)\)", SQL_PATH.read_text()
+    )
+    return {name: float(value) for name, value in rows}
+
+
+def synthetic_documents(count, fields, seed=0):
+    """
+    Generate PREDICT-shaped results: mostly high scores, some low ones,
+    absent fields and multi-value line items.
+    """
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        document = {"__documentMetadata": {"ocrScore": round(rng.uniform(0.9, 1.0), 3)}}
+        for field in fields:
+            roll = rng.random()
+            if roll < 0.05:
+                continue
+            if roll < 0.10:
+                document[field] = []
+                continue
+            values = [
+                {"score": round(rng.uniform(0.95, 1.0) if rng.random() < 0.8 else rng.uniform(0.2, 0.95), 3),
+                 "value": f"{field.lower()}-{rng.randint(1, 9999)}"}
+                for _ in range(rng.choice((1, 1, 1, 2, 3)))
+            ]
+            document[field] = values
+        documents.append(document)
+    return documents
+
+
+def loop_failures(documents, thresholds):
+    """
+    The per-record comparison process_record ran before vectorization.
+    """
+    results = []
+    for json_data in documents:
+        ocr_score = float(json_data.get("__documentMetadata", {}).get("ocrScore", 0))
+        failed_fields = []
+        if ocr_score < thresholds.get("ocrScore", 0):
+            failed_fields.append("OCR_Score")
+        for field, threshold in thresholds.items():
+            if field == "ocrScore":
+                continue
+            field_data = json_data.get(field, [])
+            if not field_data:
+                continue
+            if field_data[0].get("score", 0) < threshold:
+                failed_fields.append(field)
+        results.append(failed_fields)
+    return results
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    thresholds = seeded_thresholds()
+    fields = [field for field in thresholds if field != "ocrScore"]
+    # score_matrix imports numpy and pandas on first use; keep that out of the timings
+    evaluate_thresholds(score_matrix([], fields)[0], thresholds)
+
+    # speedup is end to end, matrix build included; compare-only leaves the
+    # build out and shows the comparison alone
+    print(
+        f"{'records':>8}  {'loop s':>8}  {'matrix s':>8}  {'compare s':>9}  {'speedup':>7}  "
+        f"{'compare-only':>12}  {'failed':>7}"
+    )
+    for count in args.records:
+        documents = synthetic_documents(count, fields, args.seed)
+        expected, loop_seconds = timed(loop_failures, documents, thresholds)
+        (matrix, errors), matrix_seconds = timed(score_matrix, documents, fields)
+        evaluation, compare_seconds = timed(evaluate_thresholds, matrix, thresholds)
+
+        if errors or list(evaluation["FAILED_FIELDS"]) != expected:
+            raise SystemExit(f"Vectorized evaluation disagrees with the loop at {count} records")
+        failed = sum(1 for fields_failed in expected if fields_failed)
+        print(
+            f"{count:>8}  {loop_seconds:>8.3f}  {matrix_seconds:>8.3f}  {compare_seconds:>9.3f}  "
+            f"{loop_seconds / (matrix_seconds + compare_seconds):>6.1f}x  "
+            f"{loop_seconds / compare_seconds:>11.1f}x  {failed:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Python shared by the pipeline's procedures and UDFs in DOC_AI_QuickStart.SQL.
+
+Upload this file to the @DOCAI_CODE stage before the script creates its
+procedures; each procedure or function that lists it in IMPORTS imports it
+as a module. COUNT_PDF_PAGES_PROC and HANDLE_PDF_FILES route files with
+RoutingTable; LOAD_MODEL_FLATTEN and the SCORE_FAILURES UDF evaluate score
+thresholds with score_matrix and evaluate_thresholds. Those two import
+numpy and pandas themselves, so only the objects that call them list the
+packages in PACKAGES.
+"""
+import fnmatch
+import hashlib
+import json
+import re
+
+
+class RoutingTable:
+    """
+    Folder-to-model routing compiled from MODEL_METADATA once per run.
+
+    A file is matched by its exact first folder (FOLDER_NAME), then by the
+    longest PATH_PREFIX, then by the first FILE_PATTERN glob (comma separated,
+    matched case-insensitively against the file name, e.g. INV-*). VERSION
+    identifies the rule set, so a MODEL_METADATA edit is picked up by the
+    next run and shows up in its result.
+    """
+
+    def __init__(self, rows):
+        self.models = {}
+        self.folders = {}
+        self.prefixes = []
+        self.patterns = []
+        for row in rows:
+            model_name = row["MODEL_NAME"]
+            self.models.setdefault(model_name, row)
+            if row.get("FOLDER_NAME"):
+                self.folders.setdefault(row["FOLDER_NAME"], model_name)
+            if row.get("PATH_PREFIX"):
+                self.prefixes.append((row["PATH_PREFIX"], model_name))
+            for pattern in (row.get("FILE_PATTERN") or "").split(","):
+                if pattern.strip():
+                    self.patterns.append((re.compile(fnmatch.translate(pattern.strip().lower())), model_name))
+        self.prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+        self.version = hashlib.sha256(
+            json.dumps(sorted(rows, key=lambda r: str(r["MODEL_NAME"])), sort_keys=True, default=str).encode()
+        ).hexdigest()[:12]
+
+    @classmethod
+    def load(cls, session, metadata_table_name):
+        return cls([row.as_dict() for row in session.sql(f"SELECT * FROM {metadata_table_name}").collect()])
+
+    def route(self, relative_path):
+        """
+        Return the model for a stage path, or None when no rule matches.
+        """
+        folder_name = relative_path.split("/")[0]
+        if folder_name in self.folders:
+            return self.folders[folder_name]
+        for prefix, model_name in self.prefixes:
+            if relative_path.startswith(prefix):
+                return model_name
+        file_name = relative_path.split("/")[-1].lower()
+        for pattern, model_name in self.patterns:
+            if pattern.match(file_name):
+                return model_name
+        return None
+
+
+def score_matrix(documents, fields):
+    """
+    Build a records x fields matrix of the scores validation looks at: the
+    document ocrScore (0 when absent) and the first value's score of each
+    field (NaN when the field is absent or empty). Returns the matrix and a
+    dict of row position -> exception for documents whose scores cannot be
+    read.
+    """
+    import numpy as np
+    import pandas as pd
+
+    scores = np.full((len(documents), len(fields) + 1), np.nan)
+    errors = {}
+    for i, document in enumerate(documents):
+        try:
+            scores[i, 0] = float(document.get("__documentMetadata", {}).get("ocrScore", 0))
+            for j, field in enumerate(fields, start=1):
+                values = document.get(field, [])
+                if values:
+                    scores[i, j] = values[0].get("score", 0)
+        except Exception as e:
+            errors[i] = e
+    return pd.DataFrame(scores, columns=["ocrScore"] + list(fields)), errors
+
+
+def evaluate_thresholds(matrix, thresholds):
+    """
+    Compare a score matrix with the SCORE_THRESHOLD vector in one vectorized
+    step. Returns OCR_SCORE, OCR_FAILED and FAILED_FIELDS per record, with
+    failed fields named and ordered as the flatten table COMMENTS expect.
+    Absent fields never fail.
+    """
+    import numpy as np
+    import pandas as pd
+
+    fields = [field for field in matrix.columns if field != "ocrScore" and field in thresholds]
+    limits = pd.Series({field: thresholds[field] for field in fields}, dtype=float)
+    below = matrix[fields].lt(limits, axis=1).to_numpy()
+    ocr_scores = matrix["ocrScore"].fillna(0)
+    ocr_failed = (ocr_scores < thresholds.get("ocrScore", 0)).to_numpy()
+
+    # Records share a handful of failure patterns, so each distinct pattern
+    # is turned into a list of names once and looked up by its bit code
+    failed = np.column_stack([ocr_failed, below])
+    names = np.array(["OCR_Score"] + fields, dtype=object)
+    if failed.shape[1] < 63:
+        codes = failed.astype(np.int64) @ (np.int64(1) << np.arange(failed.shape[1], dtype=np.int64))
+        _, first_rows, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        pattern_names = [names[failed[row]].tolist() for row in first_rows]
+        failed_fields = [pattern_names[i] for i in inverse.ravel()]
+    else:
+        failed_fields = [names[mask].tolist() for mask in failed]
+    return pd.DataFrame(
+        {"OCR_SCORE": ocr_scores, "OCR_FAILED": ocr_failed, "FAILED_FIELDS": failed_fields},
+        index=matrix.index,
+    )
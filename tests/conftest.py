@@ -0,0 +1,8 @@
+"""
+The tests drive procedure code from DOC_AI_QuickStart.SQL through the
+in-memory stand-in in benchmarks/.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
@@ -0,0 +1,50 @@
+"""
+EXTRACT_CONTROLLER against the stand-in: every run consumes PREFILTER_STREAM,
+and files a failed run left under an expired lease count as backlog even
+when no stream has new rows.
+"""
+from load_sim import SimClock
+from procedures import load_procedure
+from standin import StandInSession, Warehouse
+from synthetic import pdf_bytes
+
+
+def test_expired_leases_are_picked_up_without_stream_data():
+    clock = SimClock()
+    slow = {"INV-0000.pdf"}
+
+    def predict_delay(model_name, path, data):
+        if path in slow:
+            slow.discard(path)
+            return 31 * 60.0
+        return 2.0
+
+    warehouse = Warehouse(
+        lambda model_name, path, data: {"__documentMetadata": {"ocrScore": 0.99}}, clock=clock,
+        predict_delay=predict_delay,
+    )
+    warehouse.add_files([(f"INV-{i:04d}.pdf", pdf_bytes(1, document_id=str(i))) for i in range(51)])
+    handle = load_procedure("HANDLE_PDF_FILES", modules={"time": clock.time_module()})
+    warehouse.procedures["HANDLE_PDF_FILES"] = handle
+    controller = load_procedure("EXTRACT_CONTROLLER")
+
+    session = StandInSession(warehouse)
+    load_procedure("COUNT_PDF_PAGES_PROC")(session)
+    handle(session)
+    left_behind = [row for row in warehouse.prefilter.values() if row["STATUS"] == "IN PROGRESS"]
+    assert "INV-0000.pdf" in {row["FILENAME"] for row in left_behind}
+
+    # The run's status updates are on the stream; an idle run consumes them,
+    # so the graph's WHEN goes quiet, and the lease then lapses without
+    # changing any row
+    assert warehouse.prefilter_stream
+    assert controller(session) == "No backlog; extraction skipped."
+    assert not warehouse.prefilter_stream
+    clock.advance(31 * 60.0)
+
+    assert controller(session).startswith(f"Backlog {len(left_behind)} files")
+    # The first run was slow, so the backlog may take more than one batch
+    for _ in range(len(left_behind)):
+        if controller(session) == "No backlog; extraction skipped.":
+            break
+    assert {row["STATUS"] for row in warehouse.prefilter.values()} == {"PROCESSED"}
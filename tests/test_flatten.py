@@ -0,0 +1,201 @@
+"""
+LOAD_MODEL_FLATTEN writes the same flatten rows whether the set-based SQL
+or the record-by-record path flattens a result. The generated SQL itself is
+checked with sql_eval against the record-by-record path.
+"""
+import re
+
+import pytest
+
+from docai_common import evaluate_thresholds, score_matrix
+from procedures import load_definitions, load_procedure, seed_rows
+from sql_eval import compile_predicate, compile_select
+from standin import StandInSession, Warehouse
+from synthetic import model_thresholds, pdf_bytes, prediction, seeded_rng
+
+THRESHOLDS = seed_rows("SCORE_THRESHOLD")
+VOLATILE = ("PROCESSED_TIMESTAMP", "PROCESS_START_TIME", "PROCESS_END_TIME")
+
+
+def predict(model_name, path, data):
+    result = prediction(model_thresholds(THRESHOLDS, model_name), seeded_rng(path))
+    for field, values in result.items():
+        if field != "__documentMetadata":
+            for value in values:
+                value["value"] = f"O'Brien & Sons {value['value']}"
+    return result
+
+
+def flatten_rows(set_based_flatten):
+    warehouse = Warehouse(predict, set_based_flatten=set_based_flatten)
+    warehouse.add_files([
+        (f"{'INV-' if i % 2 else 'PURCHASES_'}{i:03d}.pdf", pdf_bytes(1, document_id=str(i))) for i in range(20)
+    ])
+    session = StandInSession(warehouse)
+    for name in ("COUNT_PDF_PAGES_PROC", "HANDLE_PDF_FILES", "LOAD_MODEL_FLATTEN"):
+        load_procedure(name)(session)
+    return {
+        table: sorted(
+            ({column: value for column, value in row.items() if column not in VOLATILE} for row in rows),
+            key=lambda row: row["RELATIVEPATH"],
+        )
+        for table, rows in warehouse.flatten.items()
+    }
+
+
+def test_quoted_values_match_between_flatten_paths():
+    in_warehouse = flatten_rows(set_based_flatten=True)
+    record_by_record = flatten_rows(set_based_flatten=False)
+
+    assert record_by_record == in_warehouse
+    values = [value for rows in record_by_record.values() for row in rows for column, value in row.items()
+              if column.endswith("_VALUE") and value != "NULL"]
+    assert values and all("O'Brien" in value and "O''Brien" not in value for value in values)
+
+
+MODEL_NAME = "INVOICE_MODEL"
+
+
+def generated_sql():
+    """
+    build_flatten_sql for MODEL_NAME with the seeded thresholds and the
+    deploy script's flatten table. Returns the thresholds, the well-formed
+    predicate, the flatten columns and the scoring query.
+    """
+    warehouse = Warehouse(None)
+    processor_class = load_definitions("LOAD_MODEL_FLATTEN", "ModelProcessor")["ModelProcessor"]
+    processor = processor_class.__new__(processor_class)
+    processor.extraction_table = "DS_DEV_DB.DOC_AI_SCHEMA.DocAI_OrderForm_Extraction"
+    processor.thresholds = warehouse.model_thresholds(MODEL_NAME)
+    processor.valid_columns = set(warehouse.columns[warehouse.models[MODEL_NAME]["FLATTEN_TABLE"].upper()])
+    return (processor.thresholds, *processor.build_flatten_sql())
+
+
+def fixtures(thresholds):
+    """
+    Well-formed and malformed PREDICT results, by file name.
+    """
+    fields = [field for field in thresholds if field != "ocrScore"]
+    first, second, third = fields[:3]
+    passing = {field: [{"score": 0.99, "value": f"{field} O'Brien"}] for field in fields}
+    return {
+        "INV-passing.pdf": dict(passing, __documentMetadata={"ocrScore": 0.99}),
+        "INV-all-low.pdf": dict(
+            {field: [{"score": 0.1, "value": "x"}] for field in fields}, __documentMetadata={"ocrScore": 0.1}
+        ),
+        "INV-multi-value.pdf": dict(
+            passing, __documentMetadata={"ocrScore": 0.99},
+            **{first: [{"score": 0.5, "value": "a"}, {"value": None}, {"score": 0.99, "value": 7}]},
+        ),
+        "INV-missing-and-empty.pdf": dict(
+            {field: passing[field] for field in fields[2:]}, __documentMetadata={"ocrScore": 0.99}, **{second: []}
+        ),
+        "INV-no-score.pdf": dict(passing, __documentMetadata={"ocrScore": 0.99}, **{first: [{"value": "a"}]}),
+        "INV-numeric-strings.pdf": dict(
+            passing, __documentMetadata={"ocrScore": "0.5"}, **{first: [{"score": "0.25", "value": "a"}]}
+        ),
+        "INV-no-metadata.pdf": dict(passing),
+        # Malformed: the SQL leaves these to the record-by-record path
+        "INV-string-field.pdf": dict(passing, __documentMetadata={"ocrScore": 0.99}, **{first: "a"}),
+        "INV-string-items.pdf": dict(passing, __documentMetadata={"ocrScore": 0.99}, **{first: ["a", "b"]}),
+        "INV-string-later-item.pdf": dict(
+            passing, __documentMetadata={"ocrScore": 0.99}, **{third: [{"score": 0.99, "value": "a"}, "b"]}
+        ),
+        "INV-string-metadata.pdf": dict(passing, __documentMetadata="0.99"),
+        "INV-word-score.pdf": dict(passing, __documentMetadata={"ocrScore": 0.99}, **{first: [{"score": "high"}]}),
+        "INV-null-ocr.pdf": dict(passing, __documentMetadata={"ocrScore": None}),
+        "INV-null-field.pdf": dict(passing, __documentMetadata={"ocrScore": 0.99}, **{first: None}),
+    }
+
+
+def python_flatten(documents):
+    """
+    Run the pipeline with the set-based flatten disabled, so every document
+    goes through the record-by-record path. Returns the warehouse.
+    """
+    warehouse = Warehouse(lambda model_name, path, data: documents[path], set_based_flatten=False)
+    warehouse.add_files([(path, pdf_bytes(1, document_id=path)) for path in documents])
+    session = StandInSession(warehouse)
+    for name in ("COUNT_PDF_PAGES_PROC", "HANDLE_PDF_FILES", "LOAD_MODEL_FLATTEN"):
+        load_procedure(name)(session)
+    assert sorted(warehouse.extraction) == sorted(documents)
+    return warehouse
+
+
+def test_generated_sql_compares_each_field_with_its_threshold():
+    thresholds, well_formed, columns, scored = generated_sql()
+    fields = [field for field in thresholds if field != "ocrScore"]
+
+    for field in fields:
+        assert (
+            f'IFF(ARRAY_SIZE(e.JSON:"{field}") > 0 AND COALESCE(e.JSON:"{field}"[0]:score::FLOAT, 0) < {thresholds[field]}, '
+            f"OBJECT_CONSTRUCT('name', '{field}', 'score', COALESCE(e.JSON:\"{field}\"[0]:score::FLOAT, 0)), NULL)"
+        ) in scored
+    ocr = 'COALESCE(e.JSON:"__documentMetadata":"ocrScore"::FLOAT, 0)'
+    assert f"IFF({ocr} < {thresholds['ocrScore']}, OBJECT_CONSTRUCT('name', 'OCR_Score', 'score', {ocr}), NULL)" in scored
+
+    # A missing or empty field is stored as 0 / 'NULL'
+    stored = [field for field in fields if f"{field.upper()}_VALUE" in columns]
+    assert stored
+    for field in stored:
+        values = f'e.JSON:"{field}"'
+        assert (
+            f"IFF(ARRAY_SIZE({values}) > 0, COALESCE({values}[0]:score::FLOAT, 0), 0) AS \"{field.upper()}_SCORE\""
+        ) in scored
+        assert re.search(
+            rf"IFF\(ARRAY_SIZE\({re.escape(values)}\) > 0, ARRAY_TO_STRING\(.*?, ', '\), 'NULL'\) AS \"{field.upper()}_VALUE\"",
+            scored,
+        )
+
+    # FAILURES, and so COMMENTS, list the fields in evaluate_thresholds' order
+    failure_order = re.findall(r"OBJECT_CONSTRUCT\('name', '([^']+)'", scored)
+    all_low = {field: [{"score": 0.0, "value": "x"}] for field in fields}
+    all_low["__documentMetadata"] = {"ocrScore": 0.0}
+    evaluation = evaluate_thresholds(score_matrix([all_low], fields)[0], thresholds)
+    assert failure_order == evaluation.at[0, "FAILED_FIELDS"]
+
+
+@pytest.fixture(scope="module")
+def compared():
+    thresholds, well_formed, columns, scored = generated_sql()
+    documents = fixtures(thresholds)
+    return thresholds, compile_predicate(well_formed), columns, compile_select(scored), documents, python_flatten(documents)
+
+
+def test_generated_predicate_matches_the_standin(compared):
+    thresholds, predicate, columns, select, documents, warehouse = compared
+    readable = {path for path, document in documents.items() if predicate({"e": {"JSON": document}})}
+
+    assert readable == {path for path, document in documents.items() if Warehouse.well_formed(document, thresholds)}
+    assert readable == {path for path in documents if "-string-" not in path and "-null-" not in path
+                        and "-word-" not in path}
+
+
+def test_generated_sql_matches_the_record_by_record_path(compared):
+    thresholds, predicate, columns, select, documents, warehouse = compared
+    table = warehouse.models[MODEL_NAME]["FLATTEN_TABLE"].upper()
+    history = warehouse.failed_history[warehouse.models[MODEL_NAME]["FAILED_SCORE_TABLE"].upper()]
+    python_rows = {row["RELATIVEPATH"]: row for row in warehouse.flatten[table]}
+
+    for path, document in documents.items():
+        row = {"e": {"RELATIVEPATH": path, "JSON": document}}
+        if not predicate(row):
+            continue
+        # Every record the SQL reads, the record-by-record path flattens too
+        assert path in python_rows, path
+        expected = python_rows[path]
+        values = select(row)
+        failures = values.pop("FAILURES")
+
+        assert values.pop("RELATIVEPATH") == path
+        assert list(values) == columns
+        for column, value in values.items():
+            if column.endswith("_VALUE"):
+                assert value == expected[column], (path, column)
+            else:
+                assert value == float(expected[column] or 0), (path, column)
+        comments = "Failed: " + ", ".join(failure["name"] for failure in failures) if failures else "All scores passed"
+        assert comments == expected["COMMENTS"], path
+        assert [(failure["name"], failure["score"]) for failure in failures] == [
+            (entry["SCORE_NAME"], entry["SCORE_VALUE"]) for entry in history if entry["FILENAME"] == path
+        ], path
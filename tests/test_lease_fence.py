@@ -0,0 +1,95 @@
+"""
+HANDLE_PDF_FILES against the stand-in when a worker's lease expires before
+its results are written and no other worker has claimed the files yet:
+nothing is written or marked PROCESSED under the lapsed lease, and a later
+claim takes the files again and extracts them.
+"""
+from load_sim import SimClock
+from procedures import load_procedure
+from standin import StandInSession, Warehouse
+from synthetic import pdf_bytes
+
+LEASE_SECONDS = 30 * 60
+
+
+class LapsingWarehouse(Warehouse):
+    """
+    Lets the worker's lease lapse once, right after the statement named by
+    LAPSE_AFTER ("directory" or "cache") has run.
+    """
+
+    lapse_after = None
+
+    def lapse(self, step):
+        if self.lapse_after == step:
+            self.lapse_after = None
+            self.clock.advance(LEASE_SECONDS + 60)
+
+    def select_directory(self, match, params):
+        rows = super().select_directory(match, params)
+        self.lapse("directory")
+        return rows
+
+    def select_cache(self, match, params):
+        rows = super().select_cache(match, params)
+        self.lapse("cache")
+        return rows
+
+
+def pipeline(predict_mode):
+    clock = SimClock()
+    warehouse = LapsingWarehouse(
+        lambda model_name, path, data: {"__documentMetadata": {"ocrScore": 0.99}}, clock=clock,
+        predict_delay=lambda model_name, path, data: 1.0,
+    )
+    warehouse.models["INVOICE_MODEL"]["PREDICT_MODE"] = predict_mode
+    session = StandInSession(warehouse)
+    handle = load_procedure("HANDLE_PDF_FILES", modules={"time": clock.time_module()})
+    count_pages = load_procedure("COUNT_PDF_PAGES_PROC")
+    return warehouse, session, handle, count_pages
+
+
+def statuses(warehouse, paths):
+    return {row["FILENAME"]: row["STATUS"] for row in warehouse.prefilter.values() if row["FILENAME"] in paths}
+
+
+def test_bulk_batch_outliving_the_lease_is_not_marked_processed():
+    warehouse, session, handle, count_pages = pipeline("BULK")
+    paths = [f"INV-{i:04d}.pdf" for i in range(5)]
+    warehouse.add_files([(path, pdf_bytes(1, document_id=path)) for path in paths])
+    count_pages(session)
+
+    warehouse.lapse_after = "directory"
+    summary = handle(session)
+
+    assert "Processed 5, failed 0," in summary
+    assert sorted(warehouse.extraction) == paths
+    assert set(statuses(warehouse, paths).values()) == {"PROCESSED"}
+    assert "made 1 claims" not in summary
+
+
+def test_cache_hits_outliving_the_lease_are_not_marked_processed():
+    warehouse, session, handle, count_pages = pipeline("ASYNC")
+    originals = [f"INV-{i:04d}.pdf" for i in range(3)]
+    copies = [f"INV-copy-{i:04d}.pdf" for i in range(3)]
+    warehouse.add_files([(path, pdf_bytes(1, document_id=path)) for path in originals])
+    count_pages(session)
+    handle(session)
+    assert set(statuses(warehouse, originals).values()) == {"PROCESSED"}
+
+    warehouse.add_files([(copy, pdf_bytes(1, document_id=path)) for copy, path in zip(copies, originals)])
+    count_pages(session)
+    warehouse.lapse_after = "cache"
+    handle(session)
+
+    # Nothing was written under the lapsed lease, so nothing is PROCESSED;
+    # the files wait for the next claim once the lease runs out
+    assert not set(copies) & set(warehouse.extraction)
+    assert "PROCESSED" not in set(statuses(warehouse, copies).values())
+
+    warehouse.clock.advance(LEASE_SECONDS + 60)
+    summary = handle(session)
+
+    assert "Processed 3, failed 0," in summary
+    assert set(statuses(warehouse, copies).values()) == {"PROCESSED"}
+    assert all(warehouse.extraction[copy]["COMMENTS"] == "File served from the extraction cache." for copy in copies)
@@ -0,0 +1,133 @@
+"""
+PredictDispatcher and the ASYNC PREDICT path of HANDLE_PDF_FILES against
+the stand-in, with PREDICT latency injected on a simulated clock.
+"""
+import json
+
+from load_sim import SimClock
+from procedures import load_definitions, load_procedure
+from standin import StandInSession, Warehouse
+from synthetic import pdf_bytes
+
+PREDICT = "SELECT DS_DEV_DB.DOC_AI_SCHEMA.INVOICE_MODEL!PREDICT( GET_PRESIGNED_URL(@INVOICE_DOCS, ?), 2 )"
+POLL_INTERVAL = 0.2
+
+PredictDispatcher = load_definitions("HANDLE_PDF_FILES", "PredictDispatcher", "now_utc")["PredictDispatcher"]
+
+
+class TrackedJob:
+    """
+    An async job that counts how many submitted jobs have not been
+    collected yet.
+    """
+
+    def __init__(self, job, state):
+        self.job = job
+        self.state = state
+
+    def is_done(self):
+        return self.job.is_done()
+
+    def result(self):
+        self.state["open"] -= 1
+        return self.job.result()
+
+
+def run_dispatcher(delays, max_in_flight, micro_batch_size=3):
+    """
+    Dispatch one PREDICT per path of DELAYS ({path: seconds}). Returns the
+    dispatcher, the micro-batches handed off and the most jobs open at once.
+    """
+    clock = SimClock()
+    warehouse = Warehouse(
+        lambda model_name, path, data: {"path": path}, clock=clock,
+        predict_delay=lambda model_name, path, data: delays[path],
+    )
+    warehouse.stages["INVOICE_DOCS"].update({path: b"%PDF-1.4" for path in delays})
+    session = StandInSession(warehouse)
+    state = {"open": 0, "peak": 0}
+
+    def submit(path):
+        state["open"] += 1
+        state["peak"] = max(state["peak"], state["open"])
+        return TrackedJob(session.sql(PREDICT, [path]).collect_nowait(), state)
+
+    batches = []
+    dispatcher = PredictDispatcher(
+        submit, batches.append, max_in_flight=max_in_flight, micro_batch_size=micro_batch_size,
+        poll_interval=POLL_INTERVAL, clock=clock, sleep=clock.advance,
+    )
+    dispatcher.run(list(delays))
+    return dispatcher, batches, state["peak"]
+
+
+def test_in_flight_bound():
+    delays = {f"INV-{i:03d}.pdf": 1.0 + (i % 5) for i in range(40)}
+    dispatcher, _, peak = run_dispatcher(delays, max_in_flight=4)
+    assert peak == 4
+    assert dispatcher.peak_in_flight == 4
+
+
+def test_latency_recorded_per_file():
+    delays = {f"INV-{i:03d}.pdf": 0.5 + i * 0.7 for i in range(12)}
+    dispatcher, _, _ = run_dispatcher(delays, max_in_flight=3)
+    assert len(dispatcher.latencies) == len(delays)
+    for latency, delay in zip(sorted(dispatcher.latencies), sorted(delays.values())):
+        assert delay <= latency <= delay + POLL_INTERVAL + 1e-9
+
+
+def test_results_handed_off_once_per_file():
+    delays = {f"INV-{i:03d}.pdf": 1.0 + (i % 3) for i in range(20)}
+    _, batches, _ = run_dispatcher(delays, max_in_flight=4, micro_batch_size=3)
+    completed = [entry for batch in batches for entry in batch]
+    assert sorted(item for item, *_ in completed) == sorted(delays)
+    assert all(error is None and json.loads(result[0][0]) == {"path": item} for item, result, error, *_ in completed)
+    assert all(len(batch) >= 3 for batch in batches[:-1])
+
+
+def test_slow_file_does_not_hold_up_the_rest():
+    delays = {"INV-000.pdf": 30.0, **{f"INV-{i:03d}.pdf": 1.0 for i in range(1, 10)}}
+    _, batches, _ = run_dispatcher(delays, max_in_flight=2, micro_batch_size=1)
+    assert [entry[0] for batch in batches for entry in batch][-1] == "INV-000.pdf"
+
+
+def test_handle_pdf_files_writes_each_async_result_once():
+    clock = SimClock()
+    warehouse = Warehouse(
+        lambda model_name, path, data: {"__documentMetadata": {"ocrScore": 0.99}}, clock=clock,
+        predict_delay=lambda model_name, path, data: 2.0 + len(path) % 4,
+    )
+    files = [(f"{'INV-' if i % 2 else 'PURCHASES_'}{i:04d}.pdf", pdf_bytes(1 + i % 3, document_id=str(i))) for i in range(60)]
+    warehouse.add_files(files)
+    inserted = []
+    add_extraction = warehouse.add_extraction
+    warehouse.add_extraction = lambda row: (inserted.append(row["RELATIVEPATH"]), add_extraction(row))
+
+    session = StandInSession(warehouse)
+    load_procedure("COUNT_PDF_PAGES_PROC")(session)
+    load_procedure("HANDLE_PDF_FILES", modules={"time": clock.time_module()})(session)
+
+    assert sorted(inserted) == sorted(path for path, _ in files)
+    assert {row["STATUS"] for row in warehouse.prefilter.values()} == {"PROCESSED"}
+    assert session.statements["SELECT ASYNC"] == len(files)
+
+
+def test_results_outliving_the_lease_are_not_written():
+    clock = SimClock()
+    warehouse = Warehouse(
+        lambda model_name, path, data: {"__documentMetadata": {"ocrScore": 0.99}}, clock=clock,
+        predict_delay=lambda model_name, path, data: 31 * 60.0 if path == "INV-0000.pdf" else 2.0,
+    )
+    files = [(f"INV-{i:04d}.pdf", pdf_bytes(1, document_id=str(i))) for i in range(51)]
+    warehouse.add_files(files)
+
+    session = StandInSession(warehouse)
+    load_procedure("COUNT_PDF_PAGES_PROC")(session)
+    summary = load_procedure("HANDLE_PDF_FILES", modules={"time": clock.time_module()})(session)
+
+    statuses = {row["FILENAME"]: row["STATUS"] for row in warehouse.prefilter.values()}
+    assert "INV-0000.pdf" not in warehouse.extraction
+    assert statuses["INV-0000.pdf"] == "IN PROGRESS"
+    assert all(statuses[path] == "PROCESSED" for path in warehouse.extraction)
+    assert all(status == "IN PROGRESS" for path, status in statuses.items() if path not in warehouse.extraction)
+    assert f"Processed {len(warehouse.extraction)}," in summary
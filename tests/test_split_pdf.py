@@ -0,0 +1,126 @@
+"""
+split_pdf and merge_predictions on the sample documents, and the split
+path of HANDLE_PDF_FILES against the stand-in.
+"""
+import io
+from pathlib import Path
+
+import pypdfium2 as pdfium
+import pytest
+
+from procedures import load_definitions, load_procedure
+from standin import StandInSession, Warehouse
+from synthetic import pdf_bytes
+
+SAMPLE_DOCS = sorted((Path(__file__).resolve().parent.parent / "sample_docs").glob("*.pdf"))
+
+definitions = load_definitions("HANDLE_PDF_FILES", "split_pdf", "merge_predictions")
+split_pdf = definitions["split_pdf"]
+merge_predictions = definitions["merge_predictions"]
+
+
+def page_count(data):
+    document = pdfium.PdfDocument(data)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def combined_sample_docs():
+    """
+    Every sample document appended into one PDF, for a document with more
+    pages than any single sample.
+    """
+    combined = pdfium.PdfDocument.new()
+    try:
+        for path in SAMPLE_DOCS:
+            source = pdfium.PdfDocument(path.read_bytes())
+            try:
+                combined.import_pages(source)
+            finally:
+                source.close()
+        buffer = io.BytesIO()
+        combined.save(buffer)
+        return buffer.getvalue()
+    finally:
+        combined.close()
+
+
+def assert_split(data, max_pages, **limits):
+    chunks = split_pdf(data, max_pages=max_pages, **limits)
+    pages = page_count(data)
+    assert chunks[0][0] == 1 and chunks[-1][1] == pages
+    for (first, last, chunk), following in zip(chunks, chunks[1:] + [(pages + 1, None, None)]):
+        assert following[0] == last + 1
+        assert page_count(chunk) == last - first + 1 <= max_pages
+    assert sum(page_count(chunk) for _, _, chunk in chunks) == pages
+    return chunks
+
+
+@pytest.mark.parametrize("path", SAMPLE_DOCS, ids=lambda path: path.name)
+def test_split_sample_doc_one_page_per_chunk(path):
+    chunks = assert_split(path.read_bytes(), max_pages=1)
+    assert len(chunks) == page_count(path.read_bytes())
+
+
+@pytest.mark.parametrize("max_pages", [1, 2, 3, 25])
+def test_split_combined_sample_docs(max_pages):
+    data = combined_sample_docs()
+    chunks = assert_split(data, max_pages=max_pages)
+    assert len(chunks) == -(-page_count(data) // max_pages)
+
+
+def test_split_halves_chunks_over_the_byte_limit():
+    data = combined_sample_docs()
+    chunks = assert_split(data, max_pages=25, max_bytes=1)
+    assert len(chunks) == page_count(data)
+
+
+def test_merge_keeps_line_items_and_lowest_score():
+    chunks = [
+        {
+            "__documentMetadata": {"ocrScore": 0.95},
+            "invoice_number": [{"value": "INV-1", "score": 0.9}],
+            "item_name": [{"value": "bolts", "score": 0.8}, {"value": "nuts", "score": 0.7}],
+        },
+        {
+            "__documentMetadata": {"ocrScore": 0.85},
+            "invoice_number": [{"value": "INV-1", "score": 0.6}],
+            "item_name": [{"value": "washers", "score": 0.5}],
+            "total": [],
+        },
+        {
+            "__documentMetadata": {"ocrScore": 0.9},
+            "invoice_number": [{"value": "INV-1", "score": 0.99}],
+            "item_name": [{"value": "bolts", "score": 0.95}],
+            "total": [{"value": "120.00", "score": 0.4}],
+        },
+    ]
+    merged = merge_predictions(chunks)
+
+    assert [value["value"] for value in merged["item_name"]] == ["bolts", "nuts", "washers", "bolts"]
+    assert merged["item_name"][0]["score"] == 0.5
+    assert merged["invoice_number"] == [{"value": "INV-1", "score": 0.6}]
+    assert merged["total"] == [{"value": "120.00", "score": 0.4}]
+    assert merged["__documentMetadata"]["ocrScore"] == 0.85
+    assert chunks[0]["item_name"][0]["score"] == 0.8
+
+
+class FailingWriteWarehouse(Warehouse):
+
+    def insert_results(self, match, params):
+        raise RuntimeError("insert failed")
+
+
+def test_split_work_removed_when_the_write_fails():
+    warehouse = FailingWriteWarehouse(lambda model_name, path, data: {"__documentMetadata": {"ocrScore": 0.99}})
+    warehouse.add_files([("INV-long.pdf", pdf_bytes(60, padding=4 * 1024 * 1024, document_id="long"))])
+    session = StandInSession(warehouse)
+    load_procedure("COUNT_PDF_PAGES_PROC")(session)
+
+    assert load_procedure("HANDLE_PDF_FILES")(session) == "General Error: insert failed"
+
+    assert session.statements["PUT"] > 0
+    assert session.statements["REMOVE"] == 1
+    assert not warehouse.stages["DOCAI_SPLIT_WORK"]